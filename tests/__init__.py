@@ -0,0 +1,6 @@
+import logging
+
+# Test fixtures build pages far larger than the QUERY_BUDGETS assume, so
+# the over-budget warnings are noise here; test_instrumentation checks the
+# budgets with QUERY_BUDGET_STRICT on.
+logging.getLogger('twitter.instrumentation').setLevel(logging.ERROR)
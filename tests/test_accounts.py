@@ -1,15 +1,25 @@
-from datetime import date
+from datetime import date, timedelta
 
 from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
 from django_webtest import WebTest
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 
-from twitter.models import ValidationToken
+from twitter.models import ValidationToken, OutgoingEmail
 
 User = get_user_model()
 
 
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise IOError('SMTP is down')
+
+
 class AccountsTestCase(WebTest):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -35,6 +45,8 @@ class AccountsTestCase(WebTest):
         form['email'] = 'sbrin@google.com'
         form['birth_date'] = '1973-8-21'
         form.submit()
+        self.assertEqual(len(mail.outbox), 0)
+        call_command('send_queued_mail', stdout=StringIO())
 
         # Postconditions
         self.assertEqual(User.objects.count(), 2)
@@ -105,6 +117,8 @@ class AccountsTestCase(WebTest):
         form = response.form
         form['email'] = 'lpage@google.com'
         form.submit()
+        self.assertEqual(len(mail.outbox), 0)
+        call_command('send_queued_mail', stdout=StringIO())
 
         # Postconditions
         self.assertEqual(ValidationToken.objects.count(), 1)
@@ -155,3 +169,154 @@ class AccountsTestCase(WebTest):
         self.assertEqual(self.user.groups.count(), 1)
         response = self.app.get('/dashboard', user=self.user)
         self.assertEqual(response.status_code, 200)
+
+    def test_expired_token_is_rejected(self):
+        """Should not validate users with an expired token"""
+        User.objects.create_user(
+            username='sergeybrin', password='password123', email='sbrin@google.com',
+            is_active=False, email_validated=False)
+        token = ValidationToken.objects.create(
+            email='sbrin@google.com', token='a' * 16,
+            expires=timezone.now() - timedelta(seconds=1))
+
+        self.app.get('/users/validate/{}'.format(token.token), status=404)
+
+        # Postconditions
+        user = User.objects.get(username='sergeybrin')
+        self.assertFalse(user.is_active)
+        self.assertFalse(user.email_validated)
+
+    @override_settings(VALIDATION_TOKENS_PER_EMAIL=2)
+    def test_tokens_per_email_are_capped(self):
+        """Should keep only the newest tokens of an email address"""
+        tokens = [ValidationToken.objects.issue('lpage@google.com')
+                  for _ in range(3)]
+
+        # Postconditions
+        self.assertEqual(
+            set(ValidationToken.objects.values_list('token', flat=True)),
+            set(token.token for token in tokens[1:]))
+
+    def test_token_only_works_for_its_purpose(self):
+        """Should reject a reset token on the validation url and back"""
+        user = User.objects.create_user(
+            username='sergeybrin', password='password123',
+            email='sbrin@google.com', is_active=False, email_validated=False)
+        reset = ValidationToken.objects.issue(
+            user.email, ValidationToken.RESET_PASSWORD, user)
+        validate = ValidationToken.objects.issue(
+            self.user.email, ValidationToken.VALIDATE_EMAIL, self.user)
+
+        self.app.get('/users/validate/{}'.format(reset.token), status=404)
+        self.app.get('/users/confirm-reset-password/{}'.format(
+            validate.token), status=404)
+
+        # Postconditions
+        user = User.objects.get(pk=user.pk)
+        self.assertFalse(user.is_active)
+        self.assertEqual(ValidationToken.objects.count(), 2)
+
+    def test_validate_user_with_shared_email(self):
+        """Should only activate the user the token was issued to"""
+        users = [User.objects.create_user(
+            username=username, password='password123',
+            email='sbrin@google.com', is_active=False, email_validated=False)
+            for username in ('sergeybrin', 'sergeybrin2')]
+        token = ValidationToken.objects.issue(
+            users[0].email, ValidationToken.VALIDATE_EMAIL, users[0])
+
+        self.app.get('/users/validate/{}'.format(token.token))
+
+        # Postconditions
+        self.assertTrue(User.objects.get(pk=users[0].pk).is_active)
+        self.assertFalse(User.objects.get(pk=users[1].pk).is_active)
+
+    def test_purge_validation_tokens(self):
+        """Should delete expired tokens only"""
+        ValidationToken.objects.create(
+            email='lpage@google.com', token='a' * 16)
+        for i in range(5):
+            ValidationToken.objects.create(
+                email='lpage@google.com', token=str(i) * 16,
+                expires=timezone.now() - timedelta(days=1))
+
+        out = StringIO()
+        call_command('purge_validation_tokens', batch_size=2, stdout=out)
+
+        # Postconditions
+        self.assertIn('Deleted 5', out.getvalue())
+        self.assertEqual(
+            list(ValidationToken.objects.values_list('token', flat=True)),
+            ['a' * 16])
+
+    @override_settings(
+        EMAIL_BACKEND='tests.test_accounts.FailingEmailBackend',
+        EMAIL_QUEUE_MAX_ATTEMPTS=2)
+    def test_queued_mail_retries_then_gives_up(self):
+        """Should back off on failures and dead-letter after max attempts"""
+        email = OutgoingEmail.objects.enqueue(
+            'Subject', 'Body', ['lpage@google.com'])
+
+        call_command('send_queued_mail', stdout=StringIO())
+        email = OutgoingEmail.objects.get(pk=email.pk)
+        self.assertEqual(email.status, OutgoingEmail.QUEUED)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, 'SMTP is down')
+        self.assertGreater(email.next_attempt, timezone.now())
+
+        OutgoingEmail.objects.update(next_attempt=timezone.now())
+        call_command('send_queued_mail', stdout=StringIO())
+
+        # Postconditions
+        email = OutgoingEmail.objects.get(pk=email.pk)
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+        self.assertEqual(email.attempts, 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_queued_mail_sent_in_batches(self):
+        """Should send every queued email and mark it as sent"""
+        for i in range(5):
+            OutgoingEmail.objects.enqueue(
+                'Subject', 'Body {}'.format(i), ['lpage@google.com'])
+
+        call_command('send_queued_mail', batch_size=2, stdout=StringIO())
+
+        # Postconditions
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(
+            OutgoingEmail.objects.filter(status=OutgoingEmail.SENT).count(), 5)
+
+    def test_queued_mail_is_claimed_once(self):
+        """Should never hand the same email to two workers"""
+        for i in range(3):
+            OutgoingEmail.objects.enqueue(
+                'Subject', 'Body {}'.format(i), ['lpage@google.com'])
+
+        first = OutgoingEmail.objects.claim('worker-1', 2)
+        second = OutgoingEmail.objects.claim('worker-2', 2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(OutgoingEmail.objects.claim('worker-3', 2), [])
+
+        # claimed emails are left to their worker
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(EMAIL_QUEUE_CLAIM_TIMEOUT=60)
+    def test_stale_claims_are_retaken(self):
+        """Should send emails claimed by a worker that died"""
+        email = OutgoingEmail.objects.enqueue(
+            'Subject', 'Body', ['lpage@google.com'])
+        OutgoingEmail.objects.claim('dead-worker', 10)
+        OutgoingEmail.objects.update(
+            claimed_at=timezone.now() - timedelta(seconds=61))
+
+        call_command('send_queued_mail', stdout=StringIO())
+
+        # Postconditions
+        self.assertEqual(len(mail.outbox), 1)
+        email = OutgoingEmail.objects.get(pk=email.pk)
+        self.assertEqual(email.status, OutgoingEmail.SENT)
+        self.assertIsNone(email.claimed_at)
+        self.assertEqual(email.claimed_by, '')
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils import timezone
+
+from twitter.models import Tweet
+
+User = get_user_model()
+
+
+class ApiTestCase(WebTest):
+    def setUp(self):
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.sergey = User.objects.create_user(
+            username='sergeybrin', password='password123')
+        self.larry.follow(self.sergey)
+        for i in range(3):
+            Tweet.objects.create(
+                user=self.sergey, content='Tweet {}'.format(i),
+                created=timezone.now() - timedelta(minutes=3 - i))
+
+    def test_home_timeline_pages(self):
+        """Should page through the home timeline with sparse fields"""
+        self.app.get('/api/timeline', status=401)
+
+        data = self.app.get('/api/timeline?limit=2&fields=content,user',
+                            user=self.larry).json
+        self.assertEqual(data['items'], [
+            {'content': 'Tweet 2', 'user': 'sergeybrin'},
+            {'content': 'Tweet 1', 'user': 'sergeybrin'}])
+        data = self.app.get('/api/timeline', {
+            'limit': 2, 'fields': 'content', 'cursor': data['next_cursor']},
+            user=self.larry).json
+        self.assertEqual(data, {'items': [{'content': 'Tweet 0'}],
+                                'next_cursor': None})
+
+    def test_unknown_fields(self):
+        """Should reject fields that do not exist"""
+        response = self.app.get('/api/users/larrypage?fields=password',
+                                status=400)
+        self.assertIn('Unknown fields: password', response.json['error'])
+
+    def test_user_tweets_conditional_get(self):
+        """Should answer unchanged polls with a 304 until a new tweet"""
+        response = self.app.get('/api/users/sergeybrin/tweets')
+        self.assertEqual(len(response.json['items']), 3)
+        etag = response.headers['ETag']
+
+        with self.assertNumQueries(2):
+            self.app.get('/api/users/sergeybrin/tweets',
+                         headers={'If-None-Match': etag}, status=304)
+        self.app.get('/api/users/sergeybrin/tweets', headers={
+            'If-Modified-Since': response.headers['Last-Modified']},
+            status=304)
+
+        Tweet.objects.create(user=self.sergey, content='Fresh')
+        response = self.app.get('/api/users/sergeybrin/tweets',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(response.json['items'][0]['content'], 'Fresh')
+
+    def test_profile_etag_follows_counters(self):
+        """Should change the profile ETag when follow counts change"""
+        response = self.app.get('/api/users/sergeybrin')
+        self.assertEqual(response.json['followers_count'], 1)
+        etag = response.headers['ETag']
+        self.app.get('/api/users/sergeybrin',
+                     headers={'If-None-Match': etag}, status=304)
+
+        self.larry.unfollow(self.sergey)
+        response = self.app.get('/api/users/sergeybrin',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(response.json['followers_count'], 0)
+
+    @override_settings(API_MAX_PAGE_SIZE=2)
+    def test_followers_and_following_stream(self):
+        """Should stream relationship lists in pages, newest first"""
+        others = [User.objects.create_user(
+            username='user{}'.format(i), password='password123')
+            for i in range(3)]
+        for other in others:
+            other.follow(self.sergey)
+
+        response = self.app.get(
+            '/api/users/sergeybrin/followers?fields=username&limit=50')
+        self.assertEqual(response.json['items'], [
+            {'username': 'user2'}, {'username': 'user1'}])
+        response = self.app.get('/api/users/sergeybrin/followers', {
+            'fields': 'username', 'cursor': response.json['next_cursor']})
+        self.assertEqual(response.json, {
+            'items': [{'username': 'user0'}, {'username': 'larrypage'}],
+            'next_cursor': None})
+
+        response = self.app.get('/api/users/larrypage/following')
+        self.assertEqual(
+            [user['username'] for user in response.json['items']],
+            ['sergeybrin'])
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from twitter import routers
+from twitter.models import ArchivedTweet, Posting, TimelineEntry, Tweet
+
+User = get_user_model()
+
+
+@override_settings(FEED_PAGE_SIZE=2)
+class ArchiveTestCase(WebTest):
+    def setUp(self):
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.sergey = User.objects.create_user(
+            username='sergeybrin', password='password123')
+        self.sergey.follow(self.larry)
+        now = timezone.now()
+        self.tweets = []
+        for days in (1, 2, 400, 500, 600):
+            tweet = Tweet.objects.create(
+                user=self.larry, content='{} days ago'.format(days))
+            Tweet.objects.filter(pk=tweet.pk).update(
+                created=now - timedelta(days=days))
+            self.tweets.append(tweet)
+
+    def archive(self, **options):
+        out = StringIO()
+        call_command('archive_tweets', stdout=out, **options)
+        return out.getvalue()
+
+    def test_moves_old_tweets(self):
+        """Should move the tweets older than the horizon in batches"""
+        self.assertEqual(self.archive(batch_size=2), 'Archived 3 tweets.\n')
+
+        self.assertEqual(
+            list(Tweet.objects.order_by('pk').values_list('pk', flat=True)),
+            [tweet.pk for tweet in self.tweets[:2]])
+        self.assertEqual(
+            sorted(ArchivedTweet.objects.values_list('pk', flat=True)),
+            [tweet.pk for tweet in self.tweets[2:]])
+        self.assertFalse(Posting.objects.filter(
+            tweet_id__in=[tweet.pk for tweet in self.tweets[2:]]).exists())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.sergey).count(), 2)
+        self.assertEqual(self.archive(), 'Archived 0 tweets.\n')
+
+    @override_settings(REPLICA_DATABASES=['replica'])
+    def test_archive_uses_the_primary(self):
+        """Should read and delete the tweets on the primary with replicas"""
+        # a fresh worker that has not written anything yet
+        routers._local.wrote = False
+        try:
+            self.assertEqual(ArchivedTweet.objects.archive_batch(10), 3)
+        finally:
+            routers._local.wrote = False
+        self.assertEqual(Tweet.objects.using('default').count(), 2)
+        self.assertEqual(ArchivedTweet.objects.count(), 3)
+
+    def test_profile_falls_through_to_archive(self):
+        """Should page through hot and archived tweets in order"""
+        self.archive()
+        contents = []
+        cursor = None
+        while True:
+            tweets, cursor = self.larry.tweets_page(cursor)
+            contents.extend(tweet.content for tweet in tweets)
+            if cursor is None:
+                break
+        self.assertEqual(contents, [
+            '1 days ago', '2 days ago', '400 days ago', '500 days ago',
+            '600 days ago'])
+
+        page = self.app.get('/larrypage').click('Load older tweets')
+        self.assertIn('400 days ago', page)
+        self.assertIn('500 days ago', page)
+
+    def test_first_page_skips_archive(self):
+        """Should not query the archive when the page is all hot tweets"""
+        self.archive()
+        with self.assertNumQueries(1):
+            self.larry.tweets_page(page_size=1)
+
+    def test_delete_archived_tweet(self):
+        """Should delete tweets from either tier"""
+        self.archive()
+        old = self.tweets[-1]
+        self.app.get('/tweet/{}/delete'.format(old.pk), user=self.larry)
+        self.assertFalse(ArchivedTweet.objects.filter(pk=old.pk).exists())
+
+        self.app.get('/tweet/{}/delete'.format(old.pk), user=self.larry,
+                     status=404)
+        self.app.get('/tweet/{}/delete'.format(self.tweets[2].pk),
+                     user=self.sergey, status=403)
@@ -0,0 +1,49 @@
+import json
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils.six import StringIO
+
+from twitter.models import Relationship, TimelineEntry, Tweet
+
+User = get_user_model()
+
+
+class BenchmarkTestCase(TestCase):
+
+    def test_seed_social_graph(self):
+        """Should seed users, follows, tweets, counters and timelines"""
+        call_command('seed_social_graph', users=30, tweets=200,
+                     avg_following=5, batch_size=50, stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Tweet.objects.count(), 200)
+        self.assertTrue(Relationship.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(
+            sum(User.objects.values_list('followers_count', flat=True)),
+            Relationship.objects.count())
+
+    def test_benchmark_report(self):
+        """Should report latency percentiles and query counts as JSON"""
+        call_command('seed_social_graph', users=10, tweets=50,
+                     avg_following=3, stdout=StringIO())
+        relationships = Relationship.objects.count()
+        existing = Tweet.objects.create(
+            user=User.objects.first(), content='benchmark tweet')
+        out = StringIO()
+
+        call_command('benchmark', iterations=5, warmup=1, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            sorted(report['scenarios']),
+            ['follow', 'home', 'profile', 'tweet', 'unfollow'])
+        for result in report['scenarios'].values():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['queries_max'], 0)
+            self.assertEqual(result['session_writes_max'], 0)
+        self.assertEqual(Relationship.objects.count(), relationships)
+        self.assertEqual(Tweet.objects.count(), 51)
+        self.assertTrue(Tweet.objects.filter(pk=existing.pk).exists())
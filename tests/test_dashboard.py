@@ -0,0 +1,125 @@
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from twitter import roles
+from twitter.models import (
+    DailyStats, HourlyTweetCount, Tweet, stats_day, stats_hour)
+
+User = get_user_model()
+
+
+class DashboardAccessTestCase(WebTest):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.group = Group.objects.create(name='Admin users')
+
+    def test_role_check_is_cached(self):
+        """Should answer repeated role checks without querying the DB"""
+        self.assertFalse(roles.is_admin(self.user))
+        with self.assertNumQueries(0):
+            self.assertFalse(roles.is_admin(self.user))
+
+    def test_membership_changes_invalidate_cache(self):
+        """Should pick up group changes made from either side"""
+        self.app.get('/dashboard', user=self.user, status=403)
+
+        self.group.user_set.add(self.user)
+        response = self.app.get('/dashboard', user=self.user)
+        self.assertIn("href='/dashboard'", response)
+
+        self.user.groups.remove(self.group)
+        self.app.get('/dashboard', user=self.user, status=403)
+
+        self.user.groups.add(self.group)
+        self.assertTrue(roles.is_admin(self.user))
+        self.group.user_set.clear()
+        self.assertFalse(roles.is_admin(self.user))
+
+    def test_stale_roles_of_other_processes(self):
+        """Should ignore roles cached before a membership change"""
+        self.user.groups.add(self.group)
+        self.assertTrue(roles.is_admin(self.user))
+        stale = cache.get(roles.cache_key(self.user.pk))
+
+        self.user.groups.remove(self.group)
+        # another process's cache still holds the old entry
+        cache.set(roles.cache_key(self.user.pk), stale)
+        self.assertFalse(roles.is_admin(User.objects.get(pk=self.user.pk)))
+        self.app.get('/dashboard', user=self.user, status=403)
+
+    def test_group_rename_invalidates_cache(self):
+        """Should drop cached roles of members when a group changes"""
+        self.user.groups.add(self.group)
+        self.assertTrue(roles.is_admin(self.user))
+
+        self.group.name = 'Former admins'
+        self.group.save()
+        self.assertFalse(roles.is_admin(self.user))
+
+
+class DashboardStatsTestCase(WebTest):
+    def setUp(self):
+        cache.clear()
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.sergey = User.objects.create_user(
+            username='sergeybrin', password='password123')
+        self.larry.groups.add(Group.objects.create(name='Admin users'))
+
+    def today(self):
+        return DailyStats.objects.get(date=stats_day(timezone.now()))
+
+    def test_counters_follow_activity(self):
+        """Should count signups, tweets, follows and active users as they happen"""
+        self.larry.follow(self.sergey)
+        self.larry.unfollow(self.sergey)
+        tweet = Tweet.objects.create(user=self.sergey, content='Hello')
+        Tweet.objects.create(user=self.sergey, content='Hello again')
+
+        stats = self.today()
+        self.assertEqual(stats.signups, 2)
+        self.assertEqual(stats.tweets, 2)
+        self.assertEqual(stats.follows, 1)
+        self.assertEqual(stats.unfollows, 1)
+        self.assertEqual(stats.active_users, 2)
+        self.assertEqual(HourlyTweetCount.objects.get(
+            hour=stats_hour(tweet.created)).tweets, 2)
+
+    def test_rebuild_stats_catches_up_bulk_writes(self):
+        """Should re-sync the rollups with rows written behind the models"""
+        Tweet.objects.bulk_create([
+            Tweet(user=self.sergey, content='Bulk {}'.format(i),
+                  created=timezone.now())
+            for i in range(3)])
+        DailyStats.objects.filter(pk=self.today().pk).update(signups=0)
+
+        out = StringIO()
+        call_command('rebuild_stats', stdout=out)
+        self.assertIn('Rebuilt stats for 2 days', out.getvalue())
+        stats = self.today()
+        self.assertEqual(stats.signups, 2)
+        self.assertEqual(stats.tweets, 3)
+        self.assertEqual(stats.active_users, 1)
+        self.assertEqual(
+            sum(HourlyTweetCount.objects.values_list('tweets', flat=True)), 3)
+
+    def test_dashboard_reads_rollups_only(self):
+        """Should render the dashboard without touching Tweet or Relationship"""
+        self.larry.follow(self.sergey)
+        Tweet.objects.create(user=self.sergey, content='Hello')
+
+        response = self.app.get('/dashboard', user=self.larry)
+        rows = response.html.select('table.daily-stats tbody tr')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(
+            [td.text for td in rows[0].find_all('td')][1:],
+            ['2', '1', '2', '1', '0'])
+        top = response.html.select('table.top-accounts td a')
+        self.assertEqual(top[0].text, '@sergeybrin')
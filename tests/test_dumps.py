@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from twitter.models import ImportCheckpoint, Relationship, Tweet
+
+User = get_user_model()
+
+
+class DumpsTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123',
+            email='larry@example.com', first_name='Larry')
+        self.sergey = User.objects.create_user(
+            username='sergeybrin', password='password123')
+        self.larry.follow(self.sergey)
+        self.sergey.follow(self.larry)
+        for i in range(5):
+            Tweet.objects.create(
+                user=self.sergey, content=u'Tweet {}, "quoted"\nand é'
+                .format(i), created=timezone.now() - timedelta(minutes=i))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def round_trip(self, file_format, checkpoint=None):
+        call_command('export_data', self.directory, format=file_format,
+                     batch_size=2, stdout=StringIO())
+        Tweet.objects.all().delete()
+        Relationship.objects.all().delete()
+        User.objects.all().delete()
+        for name, done in (checkpoint or {}).items():
+            ImportCheckpoint.objects.create(path=os.path.abspath(
+                os.path.join(self.directory, name + '.' + file_format)),
+                done=done)
+        out = StringIO()
+        call_command('import_data', self.directory, format=file_format,
+                     batch_size=2, stdout=out)
+        return out.getvalue()
+
+    def assert_imported(self, tweets=5, newest=0):
+        larry = User.objects.get(username='larrypage')
+        sergey = User.objects.get(username='sergeybrin')
+        self.assertNotEqual(larry.pk, self.larry.pk)
+        self.assertTrue(larry.check_password('password123'))
+        self.assertEqual(larry.email, 'larry@example.com')
+        self.assertEqual((larry.count_following, larry.count_followers),
+                         (1, 1))
+        self.assertEqual(Tweet.objects.filter(user=sergey).count(), tweets)
+        self.assertEqual(
+            larry.timeline()[0][0].content,
+            u'Tweet {}, "quoted"\nand é'.format(newest))
+
+    def test_jsonl_round_trip(self):
+        """Should export and re-import users, tweets and follows as JSON"""
+        out = self.round_trip('jsonl')
+        self.assertIn('Imported 2 users, 5 tweets and 2 follows', out)
+        self.assert_imported()
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_csv_round_trip(self):
+        """Should export and re-import users, tweets and follows as CSV"""
+        self.round_trip('csv')
+        self.assert_imported()
+
+    def test_resume_from_checkpoint(self):
+        """Should skip the batches an interrupted import already loaded"""
+        out = self.round_trip('jsonl', checkpoint={'tweets': 4})
+        self.assertIn('1 tweets and 2 follows', out)
+        self.assert_imported(tweets=1, newest=4)
+
+    def test_import_is_idempotent_for_users_and_follows(self):
+        """Should match existing usernames and skip existing follows"""
+        self.round_trip('jsonl')
+        call_command('import_data', self.directory, stdout=StringIO(),
+                     skip_timelines=True)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Relationship.objects.count(), 2)
@@ -0,0 +1,308 @@
+from datetime import timedelta
+
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
+
+from twitter.models import DailyStats, Tweet, TimelineEntry, Relationship
+
+User = get_user_model()
+
+
+class TimelineTestCase(WebTest):
+    def setUp(self):
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.sergey = User.objects.create_user(
+            username='sergeybrin', password='password123')
+
+    def test_tweet_fans_out_to_followers(self):
+        """Should push new tweets to the author and every follower"""
+        self.larry.follow(self.sergey)
+        tweet = Tweet.objects.create(user=self.sergey, content='Hello')
+
+        self.assertEqual(self.larry.timeline()[0], [tweet])
+        self.assertEqual(self.sergey.timeline()[0], [tweet])
+
+    def test_self_follower_gets_tweet_once(self):
+        """Should fan out once to an author listed among their followers"""
+        Relationship.objects.create(follower=self.larry, following=self.larry)
+        tweet = Tweet.objects.create(user=self.larry, content='Hello')
+
+        self.assertEqual(self.larry.timeline()[0], [tweet])
+        self.assertEqual(TimelineEntry.objects.count(), 1)
+
+    def test_tweet_is_not_kept_when_side_effects_fail(self):
+        """Should roll the tweet back when its fan-out or stats fail"""
+        def fail(tweet):
+            raise IntegrityError('stats are down')
+
+        DailyStats.objects.record_tweet = fail
+        try:
+            with self.assertRaises(IntegrityError):
+                Tweet.objects.create(user=self.larry, content='Lost')
+        finally:
+            del DailyStats.objects.record_tweet
+        self.assertFalse(Tweet.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Should copy existing tweets on follow and drop them on unfollow"""
+        old = Tweet.objects.create(user=self.sergey, content='Old one')
+        own = Tweet.objects.create(user=self.larry, content='Mine')
+        self.assertEqual(self.larry.timeline()[0], [own])
+
+        self.larry.follow(self.sergey)
+        self.assertEqual(self.larry.timeline()[0], [own, old])
+
+        self.larry.unfollow(self.sergey)
+        self.assertEqual(self.larry.timeline()[0], [own])
+
+    def test_delete_tweet_removes_timeline_entries(self):
+        """Should remove a deleted tweet from every timeline"""
+        self.larry.follow(self.sergey)
+        tweet = Tweet.objects.create(user=self.sergey, content='Oops')
+        self.assertEqual(TimelineEntry.objects.count(), 2)
+
+        feed = self.app.get('/', user=self.sergey)
+        feed.forms['delete-tweet-form-{}'.format(tweet.id)].submit()
+
+        self.assertEqual(TimelineEntry.objects.count(), 0)
+        self.assertEqual(self.larry.timeline()[0], [])
+
+    def test_home_reads_timeline(self):
+        """Should render followed tweets in the home feed"""
+        self.larry.follow(self.sergey)
+        Tweet.objects.create(user=self.sergey, content='From the timeline')
+
+        feed = self.app.get('/', user=self.larry)
+        self.assertIn('From the timeline', feed)
+
+
+class FollowCountsTestCase(WebTest):
+    def setUp(self):
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.sergey = User.objects.create_user(
+            username='sergeybrin', password='password123')
+
+    def test_follow_and_unfollow_update_counters(self):
+        """Should keep stored counters in sync with relationships"""
+        self.larry.follow(self.sergey)
+        self.larry.follow(self.sergey)
+        larry = User.objects.get(pk=self.larry.pk)
+        sergey = User.objects.get(pk=self.sergey.pk)
+        self.assertEqual((larry.count_following, larry.count_followers), (1, 0))
+        self.assertEqual((sergey.count_following, sergey.count_followers), (0, 1))
+
+        self.larry.unfollow(self.sergey)
+        self.larry.unfollow(self.sergey)
+        larry = User.objects.get(pk=self.larry.pk)
+        sergey = User.objects.get(pk=self.sergey.pk)
+        self.assertEqual((larry.count_following, larry.count_followers), (0, 0))
+        self.assertEqual((sergey.count_following, sergey.count_followers), (0, 0))
+
+    def test_repair_follow_counts(self):
+        """Should recompute drifted counters from relationships"""
+        self.larry.follow(self.sergey)
+        User.objects.update(following_count=7, followers_count=7)
+
+        out = StringIO()
+        call_command('repair_follow_counts', batch_size=1, stdout=out)
+
+        self.assertIn('repaired 2', out.getvalue())
+        larry = User.objects.get(pk=self.larry.pk)
+        sergey = User.objects.get(pk=self.sergey.pk)
+        self.assertEqual((larry.count_following, larry.count_followers), (1, 0))
+        self.assertEqual((sergey.count_following, sergey.count_followers), (0, 1))
+
+    def test_repair_follow_counts_large_batches(self):
+        """Should handle batches larger than SQLite's variable limit"""
+        User.objects.bulk_create([
+            User(username='user{}'.format(i)) for i in range(1200)])
+        self.larry.follow(self.sergey)
+        User.objects.update(following_count=7, followers_count=7)
+
+        out = StringIO()
+        call_command('repair_follow_counts', batch_size=2000, stdout=out)
+
+        self.assertIn('Checked 1202 users, repaired 1202', out.getvalue())
+
+    def test_profile_save_keeps_follow_counts(self):
+        """Should not overwrite follow counters when saving the profile"""
+        form = self.app.get('/profile', user=self.larry).forms[0]
+        form['first_name'] = 'Larry'
+        form['last_name'] = 'Page'
+        with CaptureQueriesContext(connection) as queries:
+            form.submit()
+
+        updates = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE "twitter_user"') and
+                   '"first_name"' in query['sql']]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('followers_count', updates[0])
+        self.assertEqual(User.objects.get(pk=self.larry.pk).first_name, 'Larry')
+
+
+class RelationshipTestCase(WebTest):
+    csrf_checks = False
+
+    def setUp(self):
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.others = [
+            User.objects.create_user(
+                username='user{}'.format(i), password='password123')
+            for i in range(3)]
+
+    def test_followers_and_following(self):
+        """Should return the real users on each side of the relationship"""
+        self.larry.follow(self.others[0])
+        self.others[1].follow(self.larry)
+
+        self.assertEqual(list(self.larry.following), [self.others[0]])
+        self.assertEqual(list(self.larry.followers), [self.others[1]])
+
+    def test_cannot_follow_yourself(self):
+        """Should ignore follows of the user themselves"""
+        self.larry.follow(self.larry)
+        self.assertEqual(
+            self.larry.follow_many([self.larry, self.others[0]]), 1)
+        response = self.app.post(
+            '/follow', {'username': 'larrypage'}, user=self.larry).follow()
+        self.assertIn('You cannot follow yourself.', response)
+
+        self.assertEqual(list(self.larry.following), [self.others[0]])
+        larry = User.objects.get(pk=self.larry.pk)
+        self.assertEqual((larry.count_following, larry.count_followers), (1, 0))
+
+    def test_follow_many(self):
+        """Should follow a batch of users once, skipping existing ones"""
+        self.larry.follow(self.others[0])
+        Tweet.objects.create(user=self.others[2], content='Backfilled')
+
+        # 9 for the follows themselves, 5 for the dashboard rollups
+        with self.assertNumQueries(14):
+            self.assertEqual(self.larry.follow_many(self.others), 2)
+        self.assertEqual(self.larry.follow_many(self.others), 0)
+
+        self.assertEqual(Relationship.objects.count(), 3)
+        self.assertEqual(set(self.larry.following), set(self.others))
+        self.assertEqual(
+            User.objects.get(pk=self.larry.pk).count_following, 3)
+        self.assertEqual(
+            [tweet.content for tweet in self.larry.timeline()[0]],
+            ['Backfilled'])
+
+    def test_unfollow_many(self):
+        """Should unfollow a batch of users and prune their tweets"""
+        self.larry.follow_many(self.others)
+        Tweet.objects.create(user=self.others[0], content='Gone')
+
+        self.assertEqual(self.larry.unfollow_many(self.others[:2]), 2)
+
+        self.assertEqual(list(self.larry.following), [self.others[2]])
+        self.assertEqual(
+            User.objects.get(pk=self.larry.pk).count_following, 1)
+        self.assertEqual(
+            User.objects.get(pk=self.others[0].pk).count_followers, 0)
+        self.assertEqual(self.larry.timeline()[0], [])
+
+    def test_follow_many_large_batches(self):
+        """Should handle more users than SQLite's variable limit"""
+        User.objects.bulk_create([
+            User(username='bulk{}'.format(i)) for i in range(1200)])
+        others = list(User.objects.filter(username__startswith='bulk'))
+
+        self.assertEqual(self.larry.follow_many(others), 1200)
+        self.assertEqual(self.larry.follow_many(others), 0)
+        self.assertEqual(
+            User.objects.filter(followers_count=1).count(), 1200)
+
+        self.assertEqual(self.larry.unfollow_many(others), 1200)
+        self.assertFalse(Relationship.objects.exists())
+        self.assertEqual(
+            User.objects.get(pk=self.larry.pk).count_following, 0)
+        self.assertFalse(User.objects.filter(followers_count=1).exists())
+
+
+class TweetCardCacheTestCase(WebTest):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.tweet = Tweet.objects.create(user=self.user, content='Cached')
+
+    def test_card_is_cached(self):
+        """Should store the rendered card under the tweet's cache key"""
+        self.app.get('/larrypage', user=self.user)
+        self.assertIn('Cached', cache.get(self.tweet.card_cache_key))
+
+    def test_delete_tweet_invalidates_card(self):
+        """Should drop the cached card when the tweet is deleted"""
+        feed = self.app.get('/', user=self.user)
+        key = self.tweet.card_cache_key
+        self.assertIsNotNone(cache.get(key))
+
+        feed.forms['delete-tweet-form-{}'.format(self.tweet.id)].submit()
+        self.assertIsNone(cache.get(key))
+
+    def test_profile_change_invalidates_cards(self):
+        """Should change the card key when the author's profile is saved"""
+        key = self.tweet.card_cache_key
+        form = self.app.get('/profile', user=self.user).forms[0]
+        form['first_name'] = 'Larry'
+        form['last_name'] = 'Page'
+        form.submit()
+
+        tweet = Tweet.objects.select_related('user').get(pk=self.tweet.pk)
+        self.assertNotEqual(tweet.card_cache_key, key)
+
+
+@override_settings(FEED_PAGE_SIZE=2)
+class FeedPaginationTestCase(WebTest):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.tweets = [
+            Tweet.objects.create(user=self.user, content='Tweet {}'.format(i))
+            for i in range(5)]
+        # two tweets sharing a timestamp must still page deterministically
+        first = self.tweets[0]
+        Tweet.objects.filter(pk=self.tweets[1].pk).update(created=first.created)
+        for i, tweet in enumerate(self.tweets[2:], start=2):
+            Tweet.objects.filter(pk=tweet.pk).update(
+                created=first.created + timedelta(seconds=i))
+
+    def _walk(self, url):
+        contents = []
+        response = self.app.get(url, user=self.user)
+        while True:
+            contents.extend(
+                tweet.text for tweet in response.html.select('.tweet-content'))
+            older = response.html.select('a.load-older')
+            if not older:
+                return contents
+            response = self.app.get(older[0]['href'], user=self.user)
+
+    def test_profile_pages(self):
+        """Should page through every tweet of a profile exactly once"""
+        self.assertEqual(
+            self._walk('/larrypage'),
+            ['Tweet 4', 'Tweet 3', 'Tweet 2', 'Tweet 1', 'Tweet 0'])
+
+    def test_home_pages(self):
+        """Should page through the home timeline exactly once"""
+        self.assertEqual(
+            self._walk('/'),
+            ['Tweet 4', 'Tweet 3', 'Tweet 2', 'Tweet 1', 'Tweet 0'])
+
+    def test_invalid_cursor_starts_from_newest(self):
+        """Should ignore a malformed cursor"""
+        response = self.app.get('/larrypage?cursor=nope', user=self.user)
+        self.assertIn('Tweet 4', response)
@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from twitter.entities import extract_hashtags, extract_mentions, linkify
+from twitter.models import Hashtag, HashtagCount, Mention, Tweet
+
+User = get_user_model()
+
+
+class EntitiesTestCase(WebTest):
+    def test_extract(self):
+        """Should find distinct hashtags and mentions, skipping e-mails"""
+        text = '#Django and #django with @larrypage, mail larry@example.com'
+        self.assertEqual(extract_hashtags(text), ['django'])
+        self.assertEqual(extract_mentions(text), ['larrypage'])
+
+    def test_linkify(self):
+        """Should link tags and mentions and escape everything else"""
+        self.assertEqual(
+            linkify("It's #Django <3 @larrypage"),
+            'It&#39;s <a href="/tag/django">#Django</a> &lt;3 '
+            '<a href="/larrypage">@larrypage</a>')
+
+
+class HashtagsTestCase(WebTest):
+    def setUp(self):
+        cache.clear()
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.sergey = User.objects.create_user(
+            username='sergeybrin', password='password123')
+
+    def test_home_indexes_tags_and_mentions(self):
+        """Should index the tags and mentions of tweets posted from home"""
+        response = self.app.get('/', user=self.sergey)
+        form = response.forms[0]
+        form['content'] = 'Hi @larrypage and @nobody, see #Search'
+        form.submit()
+
+        tweet = Tweet.objects.get()
+        self.assertEqual(
+            list(Hashtag.objects.values_list('tag', flat=True)), ['search'])
+        self.assertEqual(
+            list(Mention.objects.values_list('user', flat=True)),
+            [self.larry.pk])
+
+        tweet.delete()
+        self.assertFalse(Hashtag.objects.exists())
+        self.assertFalse(Mention.objects.exists())
+
+    def test_mentions_resolved_in_one_query(self):
+        """Should resolve every mention of a tweet with a single query"""
+        tweet = Tweet(user=self.sergey, created=timezone.now(),
+                      content='@larrypage @sergeybrin @a @b @c')
+        tweet.save()
+        Mention.objects.all().delete()
+        # delete the old rows, look the users up, insert the new ones
+        with self.assertNumQueries(3):
+            Mention.objects.index(tweet, replace=True)
+        self.assertEqual(Mention.objects.count(), 2)
+
+    @override_settings(FEED_PAGE_SIZE=2)
+    def test_tag_page(self):
+        """Should page through a tag newest first and list trending tags"""
+        for i in range(3):
+            Tweet.objects.create(
+                user=self.larry, content='#python number {}'.format(i),
+                created=timezone.now() - timedelta(minutes=3 - i))
+        Tweet.objects.create(user=self.larry, content='#django only')
+
+        response = self.app.get('/tag/Python')
+        self.assertIn('number 2', response)
+        self.assertNotIn('number 0', response)
+        self.assertNotIn('django only', response)
+        self.assertEqual(
+            [li.a.text for li in response.html.select('.trending-tags li')],
+            ['#python', '#django'])
+        response = response.click('Load older tweets')
+        self.assertIn('number 0', response)
+
+    def test_mentions_feed(self):
+        """Should show the tweets mentioning the logged in user"""
+        Tweet.objects.create(user=self.sergey, content='Hello @larrypage')
+        Tweet.objects.create(user=self.sergey, content='Hello everyone')
+
+        response = self.app.get('/mentions', user=self.larry)
+        self.assertIn('Hello <a href="/larrypage">@larrypage</a>', response)
+        self.assertNotIn('Hello everyone', response)
+
+    def test_trending_window(self):
+        """Should only count hashtags used within the trending window"""
+        Tweet.objects.create(
+            user=self.larry, content='#old',
+            created=timezone.now() - timedelta(days=2))
+        Tweet.objects.create(user=self.larry, content='#new #old')
+        Tweet.objects.create(user=self.larry, content='#new')
+
+        self.assertEqual(HashtagCount.objects.trending(), [('new', 2),
+                                                           ('old', 1)])
+
+    def test_reindex_bulk_loaded_tweets(self):
+        """Should index and count tags and mentions of bulk loaded tweets"""
+        Tweet.objects.bulk_create([
+            Tweet(user=self.sergey, content='#bulk hello @larrypage'),
+            Tweet(user=self.sergey, content='#bulk @nobody'),
+        ])
+        self.assertFalse(Hashtag.objects.exists())
+
+        out = StringIO()
+        call_command('reindex_tweets', stdout=out)
+        call_command('rebuild_stats', stdout=StringIO())
+
+        self.assertIn('2 hashtags, 1 mentions', out.getvalue())
+        self.assertIn('hello <a href="/larrypage">', self.app.get('/tag/bulk'))
+        response = self.app.get('/mentions', user=self.larry)
+        self.assertIn('hello <a href="/larrypage">', response)
+        self.assertNotIn('@nobody', response)
+        self.assertEqual(HashtagCount.objects.trending(), [('bulk', 2)])
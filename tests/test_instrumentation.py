@@ -0,0 +1,60 @@
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+
+from twitter.instrumentation import QueryBudgetExceeded, RequestMetrics
+from twitter.models import Tweet
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTestCase(WebTest):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='larrypage', password='password123')
+        for i in range(5):
+            other = User.objects.create_user(
+                username='user{}'.format(i), password='password123')
+            self.user.follow(other)
+            for j in range(5):
+                Tweet.objects.create(user=other, content='Tweet {}'.format(j))
+        # log in once so the budgets below don't include session creation
+        with self.settings(QUERY_BUDGET_STRICT=False):
+            self.app.get('/profile', user=self.user)
+
+    def test_server_timing_header(self):
+        """Should report query count and timings in Server-Timing"""
+        response = self.app.get('/user0', user=self.user)
+        self.assertRegexpMatches(
+            response.headers['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, '
+            r'total;dur=[\d.]+$')
+
+    def test_feeds_within_budget(self):
+        """Should render home, profile feeds and profile within budget"""
+        self.app.get('/', user=self.user)
+        self.app.get('/user0', user=self.user)
+        self.app.get('/user0')
+        self.app.get('/profile', user=self.user)
+
+    @override_settings(QUERY_BUDGETS={'twitter.views.home': 1})
+    def test_over_budget_fails(self):
+        """Should raise when a view goes over its query budget"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.app.get('/', user=self.user)
+
+    @override_settings(INSTRUMENTATION_QUERIES=False)
+    def test_query_instrumentation_off(self):
+        """Should not force the debug cursor when query timing is off"""
+        connection.force_debug_cursor = False
+        metrics = RequestMetrics()
+        self.assertFalse(connection.force_debug_cursor)
+        metrics.finish()
+        self.assertIsNone(metrics.query_count)
+
+        response = self.app.get('/', user=self.user)
+        self.assertRegexpMatches(
+            response.headers['Server-Timing'],
+            r'^tpl;dur=[\d.]+, total;dur=[\d.]+$')
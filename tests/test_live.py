@@ -0,0 +1,119 @@
+import threading
+import time
+
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from twitter.live import LocalBroker
+from twitter.models import Tweet
+
+User = get_user_model()
+
+
+class LocalBrokerTestCase(WebTest):
+    def test_publish_wakes_up_waiters(self):
+        """Should wake up requests waiting for one of the published users"""
+        broker = LocalBroker()
+        woken = []
+        listening = threading.Event()
+
+        def wait():
+            with broker.listen(1) as event:
+                listening.set()
+                woken.append(event.wait(5))
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        listening.wait(5)
+        broker.publish([2, 1])
+        waiter.join()
+
+        self.assertEqual(woken, [True])
+        self.assertEqual(broker._events, {})
+        self.assertEqual(broker._waiters, {})
+
+    def test_publish_replaces_event(self):
+        """Should make requests listening after a publish wait again"""
+        broker = LocalBroker()
+        with broker.listen(1) as first:
+            broker.publish([1])
+            with broker.listen(1) as second:
+                self.assertTrue(first.is_set())
+                self.assertFalse(second.wait(0))
+
+    @override_settings(LIVE_UPDATES_MAX_WAITERS=2)
+    def test_waiters_are_capped(self):
+        """Should not let more than LIVE_UPDATES_MAX_WAITERS requests wait"""
+        broker = LocalBroker()
+        with broker.listen(1) as first, broker.listen(2) as second:
+            with broker.listen(3) as third:
+                self.assertIsNotNone(first)
+                self.assertIsNotNone(second)
+                self.assertIsNone(third)
+        with broker.listen(3) as third:
+            self.assertIsNotNone(third)
+
+
+@override_settings(LIVE_UPDATES_TIMEOUT=0)
+class LiveUpdatesTestCase(WebTest):
+    def setUp(self):
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.sergey = User.objects.create_user(
+            username='sergeybrin', password='password123')
+        self.larry.follow(self.sergey)
+
+    def test_newer_than_cursor(self):
+        """Should fetch only tweets newer than the cursor, in one query"""
+        Tweet.objects.create(user=self.sergey, content='Seen')
+        response = self.app.get('/', user=self.larry)
+        self.assertIn('new-tweets', response)
+        cursor = response.context['live_cursor']
+
+        Tweet.objects.create(user=self.sergey, content='New one')
+        Tweet.objects.create(user=self.larry, content='Newer one')
+        with self.assertNumQueries(1):
+            tweets, next_cursor = self.larry.timeline_since(cursor)
+            self.assertEqual([tweet.content for tweet in tweets],
+                             ['Newer one', 'New one'])
+
+        self.assertEqual(self.larry.timeline_since(next_cursor),
+                         ([], next_cursor))
+
+    def test_updates_view(self):
+        """Should return the new tweet cards and the cursor to poll next"""
+        response = self.app.get('/', user=self.larry)
+        self.assertEqual(response.context['live_cursor'], '')
+        Tweet.objects.create(user=self.sergey, content='Hello live')
+
+        data = self.app.get('/updates', {'cursor': ''}, user=self.larry).json
+        self.assertEqual(data['count'], 1)
+        self.assertIn('Hello live', data['html'])
+        data = self.app.get(
+            '/updates', {'cursor': data['cursor']}, user=self.larry).json
+        self.assertEqual(data['count'], 0)
+        self.assertEqual(data['poll_after'], 0)
+
+    @override_settings(LIVE_UPDATES_TIMEOUT=30)
+    def test_updates_view_answers_at_once(self):
+        """Should not wait when there are new tweets already"""
+        Tweet.objects.create(user=self.sergey, content='Hello live')
+        started = time.time()
+        data = self.app.get('/updates', {'cursor': ''}, user=self.larry).json
+        self.assertEqual(data['count'], 1)
+        self.assertLess(time.time() - started, 5)
+
+    @override_settings(LIVE_UPDATES_MAX_WAITERS=0, LIVE_UPDATES_BUSY_DELAY=30)
+    def test_updates_view_when_busy(self):
+        """Should tell the client to back off when too many polls wait"""
+        data = self.app.get('/updates', {'cursor': ''}, user=self.larry).json
+        self.assertEqual(data['count'], 0)
+        self.assertEqual(data['poll_after'], 30)
+
+    def test_no_live_updates_on_profiles_or_older_pages(self):
+        """Should only poll from the first page of the home feed"""
+        response = self.app.get('/sergeybrin', user=self.larry)
+        self.assertNotIn('new-tweets', response)
+        response = self.app.get('/?cursor=1_1', user=self.larry)
+        self.assertNotIn('new-tweets', response)
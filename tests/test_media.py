@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from PIL import Image
+from webtest import Upload
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils.six import StringIO
+
+from twitter.avatars import thumbnail_name
+
+User = get_user_model()
+
+
+def png(size=(300, 200)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class MediaTestCase(WebTest):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, AVATAR_THUMBNAILS_ASYNC=False)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(
+            username='larrypage', first_name='Larry', last_name='Page',
+            password='password123')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+
+class AvatarThumbnailsTestCase(MediaTestCase):
+
+    def test_profile_upload_generates_thumbnails(self):
+        """Should create every thumbnail size when an avatar is uploaded"""
+        form = self.app.get('/profile', user=self.user).forms[0]
+        form['avatar'] = Upload('me.png', png(), 'image/png')
+        form.submit()
+
+        name = User.objects.get(pk=self.user.pk).avatar.name
+        for size in (48, 128, 256):
+            thumbnail = default_storage.open(thumbnail_name(name, size))
+            self.assertEqual(Image.open(thumbnail).size, (size, size))
+
+        feed = self.app.get('/larrypage', user=self.user)
+        self.assertIn(
+            default_storage.url(thumbnail_name(name, 256)), feed)
+
+    def test_feed_falls_back_to_original(self):
+        """Should serve the original avatar until thumbnails exist"""
+        self.user.avatar.save('me.png', ContentFile(png()))
+
+        feed = self.app.get('/larrypage', user=self.user)
+        self.assertIn(self.user.avatar.url, feed)
+
+    def test_generate_avatar_thumbnails_command(self):
+        """Should backfill the thumbnails of existing avatars"""
+        self.user.avatar.save('me.png', ContentFile(png()))
+
+        out = StringIO()
+        call_command('generate_avatar_thumbnails', stdout=out)
+
+        self.assertIn('Processed 1 avatars', out.getvalue())
+        self.assertTrue(default_storage.exists(
+            thumbnail_name(self.user.avatar.name, 48)))
+
+
+class MediaViewTestCase(MediaTestCase):
+    def setUp(self):
+        super(MediaViewTestCase, self).setUp()
+        self.user.avatar.save('me.png', ContentFile(png()))
+        self.url = self.user.avatar.url
+
+    def test_avatar_name_is_content_hashed(self):
+        """Should name uploaded avatars after the hash of their content"""
+        self.assertRegexpMatches(
+            self.user.avatar.name, r'^avatars/[0-9a-f]{40}\.png$')
+
+    def test_serves_hashed_file_with_long_lived_cache(self):
+        """Should stream the file with an ETag and an immutable cache"""
+        response = self.app.get(self.url)
+
+        self.assertEqual(response.body, png())
+        self.assertEqual(response.content_type, 'image/png')
+        self.assertIn('ETag', response.headers)
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('max-age=31536000', response.headers['Cache-Control'])
+
+    def test_conditional_get(self):
+        """Should answer 304 to a matching If-None-Match/If-Modified-Since"""
+        response = self.app.get(self.url)
+
+        self.app.get(self.url, status=304, headers={
+            'If-None-Match': response.headers['ETag']})
+        self.app.get(self.url, status=304, headers={
+            'If-Modified-Since': response.headers['Last-Modified']})
+        self.app.get(self.url, status=200, headers={
+            'If-None-Match': '"stale"'})
+
+    def test_sendfile_mode(self):
+        """Should hand the file off to the front proxy when configured"""
+        with self.settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect'):
+            response = self.app.get(self.url)
+
+        self.assertEqual(response.body, b'')
+        self.assertEqual(
+            response.headers['X-Accel-Redirect'],
+            '/protected-media/' + self.user.avatar.name)
+
+    def test_missing_and_traversal(self):
+        """Should 404 on missing files and paths outside MEDIA_ROOT"""
+        self.app.get('/media/avatars/nope.png', status=404)
+        self.app.get('/media/../settings.py', status=404)
+        self.app.get('/media/avatars', status=404)
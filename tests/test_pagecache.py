@@ -0,0 +1,112 @@
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+
+from twitter import pagecache
+from twitter.models import Tweet
+from twitter.pagination import encode_cursor
+
+User = get_user_model()
+
+
+class ProfilePageCacheTestCase(WebTest):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='jack', password='password123')
+        self.tweet = Tweet.objects.create(
+            user=self.user, content='just setting up')
+
+    def test_anonymous_hits_are_served_from_cache(self):
+        """Should serve anonymous profile views from the cache"""
+        first = self.app.get('/jack')
+        with self.assertNumQueries(0):
+            second = self.app.get('/jack')
+        self.assertEqual(first.body, second.body)
+        self.assertIn('just setting up', second)
+        self.assertIn('public', second['Cache-Control'])
+        self.assertIn('max-age=30', second['Cache-Control'])
+        self.assertIn('Cookie', second['Vary'])
+
+    def test_anonymous_page_has_no_forms(self):
+        """Should link to login instead of rendering a follow form"""
+        response = self.app.get('/jack')
+        self.assertEqual(response.forms, {})
+        self.assertIn('/login?next=/jack', response)
+
+    def test_tweets_invalidate_page(self):
+        """Should rebuild the page after a tweet is created or deleted"""
+        self.app.get('/jack')
+        Tweet.objects.create(user=self.user, content='second tweet')
+        self.assertIn('second tweet', self.app.get('/jack'))
+
+        feed = self.app.get('/jack', user=self.user)
+        feed.forms['delete-tweet-form-{}'.format(self.tweet.id)].submit()
+        self.assertNotIn('just setting up', self.app.get('/jack'))
+
+    def test_profile_save_invalidates_page(self):
+        """Should rebuild the page after the profile is saved"""
+        self.app.get('/jack')
+        form = self.app.get('/profile', user=self.user).forms[0]
+        form['first_name'] = 'Jack'
+        form['last_name'] = 'Dorsey'
+        version = pagecache.get_version('jack')
+        form.submit()
+        self.assertNotEqual(pagecache.get_version('jack'), version)
+
+        self.app.reset()
+        self.app.get('/jack')
+        with self.assertNumQueries(0):
+            self.app.get('/jack')
+
+    def test_logged_in_users_bypass_cache(self):
+        """Should render the page for logged in users every time"""
+        self.app.get('/jack')
+        other = User.objects.create_user(
+            username='biz', password='password123')
+        response = self.app.get('/jack', user=other)
+        self.assertIn('follow-jack', response.forms)
+        self.assertNotIn('public', response.headers.get('Cache-Control', ''))
+
+    def test_query_string_is_part_of_key(self):
+        """Should cache every page of the profile separately"""
+        self.app.get('/jack')
+        response = self.app.get('/jack?cursor={}'.format(
+            encode_cursor(self.tweet.created, self.tweet.pk)))
+        self.assertNotIn('just setting up', response)
+
+    def test_missing_profile_is_not_cached(self):
+        """Should not cache 404 responses"""
+        self.app.get('/nobody', status=404)
+        User.objects.create_user(username='nobody', password='password123')
+        self.app.get('/nobody')
+
+
+class CoalescingTestCase(WebTest):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='jack', password='password123')
+        self.app.get('/jack')
+        Tweet.objects.create(user=self.user, content='breaking news')
+
+    def hold_lock(self):
+        key = 'profile-page:jack:{}:{}'.format(
+            pagecache.get_version('jack'),
+            'd41d8cd98f00b204e9800998ecf8427e')
+        cache.add(key + ':lock', 1)
+
+    def test_serves_previous_version_while_rebuilding(self):
+        """Should serve the previous page while another request rebuilds it"""
+        self.hold_lock()
+        with self.assertNumQueries(0):
+            response = self.app.get('/jack')
+        self.assertNotIn('breaking news', response)
+
+    @override_settings(PROFILE_PAGE_WAIT=0.1)
+    def test_renders_after_waiting_without_previous_version(self):
+        """Should render the page itself when the rebuild takes too long"""
+        cache.clear()
+        self.hold_lock()
+        self.assertIn('breaking news', self.app.get('/jack'))
@@ -0,0 +1,113 @@
+import marshal
+import threading
+import time
+
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+
+from twitter import profiling
+from twitter.profiling import Sampler
+
+User = get_user_model()
+
+
+def busy_loop(done):
+    while not done.is_set():
+        sum(range(100))
+
+
+class SamplerTestCase(WebTest):
+    def test_samples_stacks_of_thread(self):
+        """Should count the collapsed stacks of the sampled thread"""
+        done = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(done,))
+        worker.start()
+        sampler = Sampler(0.001, [worker.ident])
+        sampler.start()
+        time.sleep(0.05)
+        sampler.stop()
+        done.set()
+        worker.join()
+
+        self.assertTrue(sampler.counts)
+        for stack in sampler.counts:
+            self.assertIn(';tests.test_profiling.busy_loop', stack)
+        self.assertTrue(sampler.collapsed().startswith('threading.'))
+
+
+class ProfilingTestCase(WebTest):
+    csrf_checks = False
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.admin = User.objects.create_user(
+            username='sergeybrin', password='password123')
+        group = Group.objects.create(name='Admin users')
+        self.admin.groups.add(group)
+
+    def test_pstats_download(self):
+        """Should return the request's cProfile stats to admin users"""
+        response = self.app.get('/?profile=pstats', user=self.admin)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertIn('attachment; filename="home-',
+                      response['Content-Disposition'])
+        self.assertEqual(response['X-Profiled-Status'], '200')
+        stats = marshal.loads(response.body)
+        self.assertTrue(any(name == 'home' for _, _, name in stats))
+
+    def test_collapsed_download(self):
+        """Should return the request's sampled stacks with the header"""
+        response = self.app.get('/', user=self.admin,
+                                headers={'X-Profile': 'collapsed'})
+        self.assertTrue(response['Content-Disposition'].endswith(
+            '.collapsed"'))
+        self.assertEqual(response['X-Profiled-Status'], '200')
+
+    def test_non_admins_get_the_page(self):
+        """Should ignore the profiling flag for everyone else"""
+        response = self.app.get('/?profile=pstats', user=self.user)
+        self.assertNotIn('Content-Disposition', response.headers)
+        self.assertIn('tweet-form', response)
+
+    def test_sampling_endpoint_is_admin_only(self):
+        """Should only let admin users sample requests"""
+        self.app.get('/profiling', user=self.user, status=403)
+        self.app.post('/profiling', {'seconds': 1}, user=self.user,
+                      status=403)
+
+    def test_background_sampling(self):
+        """Should sample in the background and serve what it has so far"""
+        response = self.app.post(
+            '/profiling', {'seconds': 0.05}, user=self.admin).follow()
+        self.assertIn('Sampling requests for 0.05 seconds', response)
+        sampler = profiling.current_sampler()
+        sampler.join()
+
+        response = self.app.get('/profiling', user=self.admin)
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertIn('.collapsed"', response['Content-Disposition'])
+
+    def test_waiting_views_are_not_sampled(self):
+        """Should leave long polls and the profiling view out of samples"""
+        seen = []
+        original = profiling.ProfilingMiddleware.process_response
+
+        def process_response(middleware, request, response):
+            with profiling._active_lock:
+                seen.append(
+                    threading.current_thread().ident in profiling._active)
+            return original(middleware, request, response)
+
+        profiling.ProfilingMiddleware.process_response = process_response
+        try:
+            with self.settings(LIVE_UPDATES_TIMEOUT=0):
+                self.app.get('/updates', user=self.user)
+            self.app.get('/profiling', user=self.admin, status='*')
+            self.app.get('/', user=self.user)
+        finally:
+            profiling.ProfilingMiddleware.process_response = original
+        self.assertEqual(seen, [False, False, True])
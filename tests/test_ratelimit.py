@@ -0,0 +1,91 @@
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import override_settings
+
+from twitter.models import Tweet
+from twitter.ratelimit import take_token
+
+User = get_user_model()
+
+
+class TakeTokenTestCase(WebTest):
+    def setUp(self):
+        caches['ratelimit'].clear()
+
+    def test_bucket_runs_out(self):
+        """Should refuse tokens once the bucket is empty until it refills"""
+        self.assertEqual(take_token('test', 'a', '2/h'), 0)
+        self.assertEqual(take_token('test', 'a', '2/h'), 0)
+        retry_after = take_token('test', 'a', '2/h')
+        self.assertTrue(0 < retry_after <= 3600)
+        self.assertEqual(take_token('test', 'b', '2/h'), 0)
+
+
+@override_settings(RATELIMITS={
+    'tweet': ('user', '2/m'),
+    'follow': ('user', '1/m'),
+    'login': ('ip', '2/m'),
+})
+class RateLimitTestCase(WebTest):
+    csrf_checks = False
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.sergey = User.objects.create_user(
+            username='sergeybrin', password='password123')
+
+    def post_tweet(self, user):
+        return self.app.post('/', {'content': 'Hello'}, user=user, status='*')
+
+    def test_tweets_are_limited_per_user(self):
+        """Should answer 429 with Retry-After once a user posts too much"""
+        for i in range(2):
+            self.assertEqual(self.post_tweet(self.larry).status_code, 200)
+        response = self.post_tweet(self.larry)
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response.headers['Retry-After']) <= 60)
+        self.assertEqual(Tweet.objects.count(), 2)
+
+        self.assertEqual(self.post_tweet(self.sergey).status_code, 200)
+
+    def test_follow_and_unfollow_share_a_limit(self):
+        """Should limit follows and unfollows together"""
+        self.app.post('/follow', {'username': 'sergeybrin'}, user=self.larry)
+        self.app.post('/unfollow', {'username': 'sergeybrin'},
+                      user=self.larry, status=429)
+        self.assertTrue(self.larry.is_following(self.sergey))
+
+    def test_logins_are_limited_per_ip(self):
+        """Should limit login attempts by IP through the middleware"""
+        self.app.get('/login')
+        for i in range(2):
+            self.app.post('/login', {
+                'username': 'larrypage', 'password': 'wrong'},
+                extra_environ={'REMOTE_ADDR': '10.0.0.1'})
+        self.app.post('/login', {
+            'username': 'larrypage', 'password': 'password123'},
+            extra_environ={'REMOTE_ADDR': '10.0.0.1'}, status=429)
+        self.app.post('/login', {
+            'username': 'larrypage', 'password': 'password123'},
+            extra_environ={'REMOTE_ADDR': '10.0.0.2'}, status=302)
+
+    @override_settings(RATELIMIT_PROXY_COUNT=1)
+    def test_logins_are_limited_per_forwarded_ip(self):
+        """Should tell clients apart by X-Forwarded-For behind a proxy"""
+        self.app.get('/login')
+        for ip in ('10.0.0.1', '10.0.0.1', '10.0.0.2'):
+            self.app.post('/login', {
+                'username': 'larrypage', 'password': 'wrong'},
+                headers={'X-Forwarded-For': 'spoofed, ' + ip},
+                extra_environ={'REMOTE_ADDR': '192.168.0.1'})
+        self.app.post('/login', {
+            'username': 'larrypage', 'password': 'password123'},
+            headers={'X-Forwarded-For': '10.0.0.1'},
+            extra_environ={'REMOTE_ADDR': '192.168.0.1'}, status=429)
+        self.app.post('/login', {
+            'username': 'larrypage', 'password': 'password123'},
+            headers={'X-Forwarded-For': '10.0.0.2'},
+            extra_environ={'REMOTE_ADDR': '192.168.0.1'}, status=302)
@@ -0,0 +1,66 @@
+import time
+
+from django.contrib.auth.models import Group
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from twitter import routers
+from twitter.models import Relationship, Tweet
+
+
+@override_settings(REPLICA_DATABASES=['replica'], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTestCase(TestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.middleware = routers.PrimaryPinningMiddleware()
+        self.session = None
+
+    def tearDown(self):
+        routers._local.wrote = routers._local.pinned = False
+
+    def start_request(self):
+        request = RequestFactory().get('/')
+        SessionMiddleware().process_request(request)
+        if self.session is not None:
+            request.session = self.session
+        self.session = request.session
+        self.middleware.process_request(request)
+        return request
+
+    def finish_request(self, request):
+        self.middleware.process_response(request, HttpResponse())
+
+    def test_reads_go_to_replicas(self):
+        """Should send reads of the routed models only to a replica"""
+        self.finish_request(self.start_request())
+        request = self.start_request()
+        self.assertEqual(self.router.db_for_read(Tweet), 'replica')
+        self.assertEqual(self.router.db_for_read(Relationship), 'replica')
+        self.assertIsNone(self.router.db_for_read(Group))
+        self.assertIsNone(self.router.db_for_write(Group))
+        self.assertEqual(self.router.db_for_read(Tweet), 'replica')
+        self.finish_request(request)
+        self.assertNotIn(routers.PIN_SESSION_KEY, self.session)
+
+    def test_write_pins_the_session_to_the_primary(self):
+        """Should read from the primary after a write, then for a while"""
+        request = self.start_request()
+        self.assertIsNone(self.router.db_for_write(Tweet))
+        self.assertIsNone(self.router.db_for_read(Tweet))
+        self.finish_request(request)
+
+        # e.g. the redirect that follows posting a tweet
+        request = self.start_request()
+        self.assertIsNone(self.router.db_for_read(Tweet))
+        self.finish_request(request)
+
+        self.session[routers.PIN_SESSION_KEY] = time.time() - 1
+        self.start_request()
+        self.assertEqual(self.router.db_for_read(Tweet), 'replica')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replicas(self):
+        """Should leave every read on the primary without replicas"""
+        self.start_request()
+        self.assertIsNone(self.router.db_for_read(Tweet))
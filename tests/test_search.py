@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from twitter.models import Posting, Tweet
+from twitter.search import tokenize
+
+User = get_user_model()
+
+
+class SearchTestCase(WebTest):
+    def setUp(self):
+        self.larry = User.objects.create_user(
+            username='larrypage', password='password123')
+
+    def tweet(self, content, minutes_ago=0):
+        return Tweet.objects.create(
+            user=self.larry, content=content,
+            created=timezone.now() - timedelta(minutes=minutes_ago))
+
+    def test_tokenize(self):
+        """Should split text into distinct lowercase terms without stop words"""
+        self.assertEqual(
+            tokenize('The #Django tutorial, and the django ORM!'),
+            ['django', 'tutorial', 'orm'])
+
+    def test_ranks_by_matched_terms_then_recency(self):
+        """Should return the tweets matching most terms first, newest first"""
+        old = self.tweet('Learning python', minutes_ago=10)
+        both = self.tweet('Learning django with python', minutes_ago=5)
+        new = self.tweet('Shipping django', minutes_ago=1)
+        self.tweet('Nothing to see here')
+
+        tweets, next_cursor = Posting.objects.search('python django')
+        self.assertEqual(tweets, [both, new, old])
+        self.assertIsNone(next_cursor)
+
+    def test_cursor_pagination(self):
+        """Should page through ranked results without repeating tweets"""
+        tweets = [self.tweet('django {}'.format(i), minutes_ago=i)
+                  for i in range(5)]
+        tweets.append(self.tweet('django python', minutes_ago=10))
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = Posting.objects.search(
+                'django python', cursor, page_size=2)
+            seen.extend(page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, [tweets[-1]] + tweets[:-1])
+
+    @override_settings(SEARCH_MAX_CANDIDATES=3)
+    def test_candidates_are_bounded(self):
+        """Should only rank the newest postings of each term"""
+        tweets = [self.tweet('django {}'.format(i), minutes_ago=i)
+                  for i in range(5)]
+        both = self.tweet('django python', minutes_ago=10)
+
+        with self.assertNumQueries(3):
+            found, next_cursor = Posting.objects.search('django python')
+        # too old to be a django candidate, so it only ranks for python
+        self.assertEqual(found, tweets[:3] + [both])
+        self.assertIsNone(next_cursor)
+
+    def test_index_follows_tweet_changes(self):
+        """Should update the index when tweets are edited or deleted"""
+        tweet = self.tweet('Hello world')
+        tweet.content = 'Goodbye world'
+        tweet.save()
+        self.assertEqual(Posting.objects.search('hello')[0], [])
+        self.assertEqual(Posting.objects.search('goodbye')[0], [tweet])
+
+        tweet.delete()
+        self.assertFalse(Posting.objects.exists())
+
+    def test_reindex_tweets(self):
+        """Should rebuild the index of tweets written behind the models"""
+        Tweet.objects.bulk_create([
+            Tweet(user=self.larry, content='Bulk loaded {}'.format(i))
+            for i in range(5)])
+        self.assertEqual(Posting.objects.search('bulk')[0], [])
+
+        out = StringIO()
+        call_command('reindex_tweets', batch_size=2, stdout=out)
+        self.assertIn('Indexed 5 tweets', out.getvalue())
+        self.assertEqual(len(Posting.objects.search('bulk')[0]), 5)
+
+        call_command('reindex_tweets', stdout=StringIO())
+        self.assertEqual(Posting.objects.filter(term='bulk').count(), 5)
+
+    @override_settings(FEED_PAGE_SIZE=1)
+    def test_search_view(self):
+        """Should render ranked results with a link to the next page"""
+        self.tweet('Django tips', minutes_ago=1)
+        self.tweet('More django tips')
+
+        response = self.app.get('/search', {'q': 'django'})
+        self.assertIn('More django tips', response)
+        self.assertNotIn('Django tips</', response)
+        response = response.click('More results')
+        self.assertIn('Django tips', response)
+        self.assertNotIn('load-older', response)
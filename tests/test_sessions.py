@@ -0,0 +1,68 @@
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from twitter.models import Tweet
+from twitter.routers import PIN_SESSION_KEY
+from twitter.sessions import SessionStore
+
+User = get_user_model()
+
+
+class SessionTestCase(WebTest):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='password123')
+        self.tweet = Tweet.objects.create(user=self.user, content='Hello')
+        form = self.app.get('/login').form
+        form['username'] = 'larrypage'
+        form['password'] = 'password123'
+        form.submit()
+
+    def session_queries(self, queries):
+        return [query['sql'] for query in queries.captured_queries
+                if 'django_session' in query['sql']]
+
+    def test_feed_does_not_touch_session_table(self):
+        """Should read the session from the cache on a feed GET"""
+        with CaptureQueriesContext(connection) as queries:
+            self.app.get('/')
+        self.assertEqual(self.session_queries(queries), [])
+
+    def test_messages_do_not_write_session(self):
+        """Should keep messages in a cookie"""
+        feed = self.app.get('/')
+        with CaptureQueriesContext(connection) as queries:
+            response = feed.forms[
+                'delete-tweet-form-{}'.format(self.tweet.id)].submit()
+            response = response.follow()
+        self.assertIn('Tweet successfully deleted', response)
+        self.assertEqual(self.session_queries(queries), [])
+        self.assertFalse(Tweet.objects.exists())
+
+    def test_cache_only_keys_skip_database(self):
+        """Should only write the database when persistent keys change"""
+        session = SessionStore()
+        session['user'] = 'larry'
+        session.create()
+        stored = Session.objects.get(session_key=session.session_key)
+
+        session = SessionStore(session.session_key)
+        session[PIN_SESSION_KEY] = 10
+        session.save()
+        self.assertEqual(
+            Session.objects.get(pk=stored.pk).session_data,
+            stored.session_data)
+        self.assertEqual(
+            SessionStore(session.session_key)[PIN_SESSION_KEY], 10)
+
+        session = SessionStore(session.session_key)
+        session['user'] = 'sergey'
+        session.save()
+        cache.clear()
+        session = SessionStore(session.session_key)
+        self.assertEqual(session['user'], 'sergey')
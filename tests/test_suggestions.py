@@ -0,0 +1,58 @@
+from django_webtest import WebTest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils.six import StringIO
+
+from twitter.models import Suggestion
+
+User = get_user_model()
+
+
+class SuggestionsTestCase(WebTest):
+    def setUp(self):
+        self.larry, self.sergey, self.eric, self.marissa, self.susan = [
+            User.objects.create_user(username=name, password='password123')
+            for name in ('larrypage', 'sergeybrin', 'ericschmidt',
+                         'marissamayer', 'susanw')]
+        self.larry.follow_many([self.sergey, self.eric])
+        self.sergey.follow_many([self.marissa, self.susan])
+        self.eric.follow_many([self.marissa, self.larry])
+
+    def compute(self, **options):
+        out = StringIO()
+        call_command('compute_suggestions', stdout=out, **options)
+        return out.getvalue()
+
+    def suggested(self, user):
+        return list(Suggestion.objects.filter(user=user).values_list(
+            'suggested__username', 'score'))
+
+    def test_friends_of_friends_scored_by_mutual_follows(self):
+        """Should suggest accounts followed by friends, most mutuals first"""
+        self.compute(full=True)
+        self.assertEqual(
+            self.suggested(self.larry), [('marissamayer', 2), ('susanw', 1)])
+        self.assertEqual(self.suggested(self.eric), [('sergeybrin', 1)])
+        self.assertEqual(self.suggested(self.marissa), [])
+
+    def test_incremental_run_only_revisits_changed_neighborhoods(self):
+        """Should recompute flagged users and their followers only"""
+        self.assertIn('for 5 users', self.compute())
+        self.assertIn('for 0 users', self.compute())
+
+        self.sergey.unfollow(self.susan)
+        # sergey changed, and larry follows sergey
+        self.assertIn('for 2 users', self.compute())
+        self.assertEqual(self.suggested(self.larry), [('marissamayer', 2)])
+
+    def test_home_shows_suggestions(self):
+        """Should list suggestions on the home feed, minus new follows"""
+        self.compute()
+        self.larry.follow(self.susan)
+
+        response = self.app.get('/', user=self.larry)
+        self.assertEqual(
+            [a.text for a in response.html.select('.who-to-follow a')],
+            ['@marissamayer'])
+        response = self.app.get('/sergeybrin', user=self.larry)
+        self.assertFalse(response.html.select('.who-to-follow'))
@@ -1,7 +1,8 @@
 from django.contrib import admin
 
-from .models import Tweet, Relationship, User
+from .models import Tweet, Relationship, User, OutgoingEmail
 
 admin.site.register(Tweet)
 admin.site.register(Relationship)
 admin.site.register(User)
+admin.site.register(OutgoingEmail)
@@ -0,0 +1,246 @@
+"""Read-only JSON API.
+
+Lists are keyset paginated (`?cursor=` and `?limit=`, the next cursor is
+returned as `next_cursor`) and every endpoint accepts `?fields=` with a
+comma separated subset of the fields of its items.
+
+Responses carry an ETag derived from a cheap version query (the newest
+tweet, the profile update time and counters, the newest relationship)
+that runs before anything else, so a poll with a matching If-None-Match
+gets a 304 without loading or serializing any item. Lists are written
+out with a `StreamingHttpResponse` while rows are read from the database,
+so a long follower list never sits in memory as a whole.
+"""
+import calendar
+import hashlib
+import json
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.http import (
+    HttpResponseNotModified, JsonResponse, StreamingHttpResponse)
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from .models import Relationship, TimelineEntry, Tweet
+from .pagination import after_cursor, encode_cursor
+
+User = get_user_model()
+
+TWEET_FIELDS = OrderedDict([
+    ('id', lambda tweet: tweet.pk),
+    ('content', lambda tweet: tweet.content),
+    ('created', lambda tweet: tweet.created),
+    ('user', lambda tweet: tweet.user.username if tweet.user_id else None),
+])
+
+USER_FIELDS = OrderedDict([
+    ('id', lambda user: user.pk),
+    ('username', lambda user: user.username),
+    ('first_name', lambda user: user.first_name),
+    ('last_name', lambda user: user.last_name),
+    ('avatar', lambda user: user.avatar.url if user.avatar else None),
+    ('following_count', lambda user: user.following_count),
+    ('followers_count', lambda user: user.followers_count),
+    ('date_joined', lambda user: user.date_joined),
+])
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def api_view(view):
+    """Restricts `view` to GET/HEAD and turns `BadRequest` into a 400."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    return wrapper
+
+
+def require_login(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated():
+            return JsonResponse(
+                {'error': 'Authentication required.'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def get_fields(request, available):
+    """The fields asked for with `?fields=`, all of them by default."""
+    names = [name for name in request.GET.get('fields', '').split(',')
+             if name]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise BadRequest('Unknown fields: {}. Available fields: {}.'.format(
+            ', '.join(unknown), ', '.join(available)))
+    return [(name, available[name]) for name in names or available]
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.FEED_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit must be a number.')
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def serialize(obj, fields):
+    return OrderedDict((name, get(obj)) for name, get in fields)
+
+
+def make_etag(request, *version):
+    """ETag of the response to `request` for data at `version`. The query
+    string is part of it since it selects the page and the fields."""
+    key = repr(version) + request.get_full_path()
+    return quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+
+def not_modified(request, etag, last_modified=None):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or \
+            if_none_match.strip() == '*'
+    if last_modified is None:
+        return False
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE'))
+    return since is not None and \
+        calendar.timegm(last_modified.utctimetuple()) <= since
+
+
+def conditional(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(
+            calendar.timegm(last_modified.utctimetuple()))
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
+
+
+def stream_page(rows, limit, fields, cursor_of):
+    """Writes out `{"items": [...], "next_cursor": ...}` one item at a time.
+    `rows` must yield up to `limit + 1` items, the extra one only telling
+    that there is a next page."""
+    encoder = DjangoJSONEncoder()
+    yield '{"items": ['
+    last = None
+    for count, row in enumerate(rows):
+        if count == limit:
+            yield '], "next_cursor": {}}}'.format(json.dumps(cursor_of(last)))
+            return
+        yield (',' if count else '') + encoder.encode(serialize(row, fields))
+        last = row
+    yield '], "next_cursor": null}'
+
+
+def tweet_list(request, entries, newest, id_field='id', version=()):
+    """Streams the page of `entries` (tweets, or rows with a `tweet`)
+    after `?cursor=`. `newest` is the `(id, created)` of the newest entry,
+    or None."""
+    fields = get_fields(request, TWEET_FIELDS)
+    limit = get_limit(request)
+    etag = make_etag(request, newest and newest[0], *version)
+    last_modified = newest[1] if newest else None
+    if not_modified(request, etag, last_modified):
+        return conditional(HttpResponseNotModified(), etag, last_modified)
+
+    rows = after_cursor(
+        entries, request.GET.get('cursor'), id_field)[:limit + 1]
+    attname = entries.model._meta.get_field(id_field).attname
+    if id_field != 'id':
+        fields = [(name, lambda entry, get=get: get(entry.tweet))
+                  for name, get in fields]
+    response = StreamingHttpResponse(
+        stream_page(rows.iterator(), limit, fields,
+                    lambda row: encode_cursor(row.created,
+                                              getattr(row, attname))),
+        content_type='application/json')
+    return conditional(response, etag, last_modified)
+
+
+def relationship_list(request, user, side, count):
+    """Streams the users on one side of `user`'s relationships, most
+    recent relationship first. The cursor is a relationship id."""
+    fields = get_fields(request, USER_FIELDS)
+    limit = get_limit(request)
+    other = 'following' if side == 'follower' else 'follower'
+    relationships = Relationship.objects.filter(**{other: user})
+    newest = relationships.aggregate(newest=Max('id'))['newest']
+    etag = make_etag(request, count, newest)
+    if not_modified(request, etag):
+        return conditional(HttpResponseNotModified(), etag)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            relationships = relationships.filter(pk__lt=int(cursor))
+        except ValueError:
+            raise BadRequest('Invalid cursor.')
+    rows = relationships.select_related(side).order_by('-pk')[:limit + 1]
+    response = StreamingHttpResponse(
+        stream_page(rows.iterator(), limit,
+                    [(name, lambda row, get=get: get(getattr(row, side)))
+                     for name, get in fields],
+                    lambda row: str(row.pk)),
+        content_type='application/json')
+    return conditional(response, etag)
+
+
+@api_view
+@require_login
+def home_timeline(request):
+    entries = TimelineEntry.objects.for_user(request.user)
+    newest = entries.order_by('-created', '-tweet').values_list(
+        'tweet_id', 'created').first()
+    response = tweet_list(request, entries, newest, id_field='tweet',
+                          version=(request.user.pk,))
+    patch_vary_headers(response, ['Cookie'])
+    patch_cache_control(response, private=True)
+    return response
+
+
+@api_view
+def user_profile(request, username):
+    user = get_object_or_404(User, username=username)
+    fields = get_fields(request, USER_FIELDS)
+    # Follow counters change without touching `updated`, hence no
+    # Last-Modified here.
+    etag = make_etag(request, user.cache_version, user.following_count,
+                     user.followers_count)
+    if not_modified(request, etag):
+        return conditional(HttpResponseNotModified(), etag)
+    return conditional(JsonResponse(serialize(user, fields)), etag)
+
+
+@api_view
+def user_tweets(request, username):
+    user = get_object_or_404(User, username=username)
+    tweets = Tweet.objects.filter(user=user).select_related('user')
+    newest = tweets.order_by('-created', '-id').values_list(
+        'id', 'created').first()
+    return tweet_list(request, tweets, newest,
+                      version=(user.cache_version,))
+
+
+@api_view
+def followers(request, username):
+    user = get_object_or_404(User, username=username)
+    return relationship_list(request, user, 'follower', user.followers_count)
+
+
+@api_view
+def following(request, username):
+    user = get_object_or_404(User, username=username)
+    return relationship_list(request, user, 'following', user.following_count)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TwitterConfig(AppConfig):
     name = 'twitter'
+
+    def ready(self):
+        from . import checks, signals  # noqa
@@ -0,0 +1,103 @@
+"""Avatar thumbnails.
+
+Every uploaded avatar is resized to the square sizes listed in
+AVATAR_THUMBNAIL_SIZES and stored next to the original, once as JPEG and
+once as WebP (when Pillow was built with WebP support). Generation runs on
+a small thread pool so the profile request doesn't wait for Pillow.
+"""
+import logging
+import os
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+FORMATS = (('jpg', 'JPEG'), ('webp', 'WEBP'))
+
+_pool = None
+
+
+def thumbnail_name(name, size, extension='jpg'):
+    """Storage name of the `size` px thumbnail of the avatar `name`, e.g.
+    `avatars/thumbs/me_128.jpg` for `avatars/me.png`."""
+    directory, filename = os.path.split(name)
+    base = os.path.splitext(filename)[0]
+    return os.path.join(
+        directory, 'thumbs', '{}_{}.{}'.format(base, size, extension))
+
+
+def best_size(size):
+    """Smallest configured thumbnail size that is at least `size` px."""
+    sizes = sorted(settings.AVATAR_THUMBNAIL_SIZES)
+    for candidate in sizes:
+        if candidate >= size:
+            return candidate
+    return sizes[-1]
+
+
+def webp_supported():
+    Image.init()
+    return 'WEBP' in Image.SAVE
+
+
+def generate_thumbnails(name, force=False):
+    """Creates every thumbnail of the avatar stored as `name`. Existing
+    thumbnails are kept unless `force` is set. Returns the number of files
+    written."""
+    formats = [(extension, image_format)
+               for extension, image_format in FORMATS
+               if image_format != 'WEBP' or webp_supported()]
+    with default_storage.open(name) as original:
+        image = Image.open(original)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    written = 0
+    for size in settings.AVATAR_THUMBNAIL_SIZES:
+        thumbnail = None
+        for extension, image_format in formats:
+            target = thumbnail_name(name, size, extension)
+            if default_storage.exists(target):
+                if not force:
+                    continue
+                default_storage.delete(target)
+            if thumbnail is None:
+                thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            output = thumbnail
+            if image_format == 'JPEG' and output.mode != 'RGB':
+                output = output.convert('RGB')
+            buffer = BytesIO()
+            output.save(buffer, image_format, quality=85)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+            written += 1
+    return written
+
+
+def _generate_thumbnails_logged(name):
+    try:
+        generate_thumbnails(name)
+    except Exception:
+        logger.exception('Could not generate thumbnails for %s', name)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPool(settings.AVATAR_THUMBNAIL_WORKERS)
+    return _pool
+
+
+def schedule_thumbnails(name):
+    """Generates the thumbnails of `name` off the request thread (or right
+    away when AVATAR_THUMBNAILS_ASYNC is off, e.g. in tests)."""
+    if settings.AVATAR_THUMBNAILS_ASYNC:
+        get_pool().apply_async(_generate_thumbnails_logged, (name,))
+    else:
+        _generate_thumbnails_logged(name)
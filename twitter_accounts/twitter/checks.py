@@ -0,0 +1,36 @@
+"""System checks of the twitter app's settings."""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register(deploy=True)
+def check_ratelimit_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get(settings.RATELIMIT_CACHE, {}).get(
+        'BACKEND', '')
+    if not backend.endswith('LocMemCache'):
+        return []
+    return [Warning(
+        'RATELIMIT_CACHE is a local-memory cache, so every process keeps '
+        'rate limit buckets of its own.',
+        hint='Point RATELIMIT_CACHE to a cache shared by all processes, '
+             'such as memcached.',
+        id='twitter.W001',
+    )]
+
+
+@register(deploy=True)
+def check_session_cache(app_configs, **kwargs):
+    if settings.SESSION_ENGINE != 'twitter.sessions':
+        return []
+    backend = settings.CACHES.get(settings.SESSION_CACHE_ALIAS, {}).get(
+        'BACKEND', '')
+    if not backend.endswith('LocMemCache'):
+        return []
+    return [Warning(
+        'Sessions are read from a local-memory cache, so every process '
+        'keeps copies of its own and serves stale sessions.',
+        hint='Point SESSION_CACHE_ALIAS to a cache shared by all processes, '
+             'such as memcached, or set TWITTER_SESSION_ENGINE='
+             'signed_cookies.',
+        id='twitter.W002',
+    )]
@@ -0,0 +1,15 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import roles
+
+
+def user_roles(request):
+    """Exposes the cached group names of the current user as `user_groups`
+    and whether they may see the admin dashboard as `is_admin_user`."""
+    user = getattr(request, 'user', None)
+    if user is None:
+        return {}
+    return {
+        'user_groups': SimpleLazyObject(lambda: roles.get_group_names(user)),
+        'is_admin_user': SimpleLazyObject(lambda: roles.is_admin(user)),
+    }
@@ -0,0 +1,128 @@
+"""Readers and writers for the `export_data`/`import_data` dumps.
+
+A dump is a directory with one file per model (`users`, `tweets` and
+`follows`), either newline-delimited JSON (`.jsonl`, one object per line)
+or CSV with a header row (`.csv`). Files are read and written one record
+at a time so dumps of any size go through in constant memory.
+"""
+import csv
+import io
+import json
+import os
+from collections import OrderedDict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import six
+from django.utils.dateparse import parse_date, parse_datetime
+
+FORMATS = ('jsonl', 'csv')
+
+
+def _text(value):
+    return value or ''
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return value in ('true', 'True', '1')
+
+
+def _nullable(parse):
+    def parser(value):
+        if value is None or value == '':
+            return None
+        return parse(value)
+    return parser
+
+
+# name -> (model label, fields and the parser of each one)
+DUMPS = OrderedDict([
+    ('users', ('twitter.User', OrderedDict([
+        ('id', int),
+        ('username', _text),
+        ('email', _text),
+        ('password', _text),
+        ('first_name', _text),
+        ('last_name', _text),
+        ('is_active', _bool),
+        ('date_joined', _nullable(parse_datetime)),
+        ('birth_date', _nullable(parse_date)),
+        ('email_validated', _bool),
+    ]))),
+    ('tweets', ('twitter.Tweet', OrderedDict([
+        ('user_id', _nullable(int)),
+        ('content', _text),
+        ('created', _nullable(parse_datetime)),
+    ]))),
+    ('follows', ('twitter.Relationship', OrderedDict([
+        ('follower_id', int),
+        ('following_id', int),
+    ]))),
+])
+
+
+def dump_path(directory, name, file_format):
+    return os.path.join(directory, '{}.{}'.format(name, file_format))
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _open(path, mode):
+    # The csv module of Python 2 only works with byte strings.
+    if six.PY2:
+        return open(path, mode + 'b')
+    return io.open(path, mode, encoding='utf-8', newline='')
+
+
+def _encode(value):
+    if six.PY2 and isinstance(value, six.text_type):
+        return value.encode('utf-8')
+    return value
+
+
+def _decode(value):
+    if six.PY2 and isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+
+def write_records(path, file_format, fields, rows):
+    """Writes `rows` (tuples of values in `fields` order) to `path`.
+    Returns how many were written."""
+    count = 0
+    with _open(path, 'w') as f:
+        if file_format == 'csv':
+            writer = csv.writer(f)
+            writer.writerow([_encode(field) for field in fields])
+            for row in rows:
+                writer.writerow([_encode(_csv_value(value)) for value in row])
+                count += 1
+        else:
+            encoder = DjangoJSONEncoder(ensure_ascii=False)
+            for row in rows:
+                f.write(_encode(encoder.encode(OrderedDict(zip(fields, row)))))
+                f.write(_encode(u'\n'))
+                count += 1
+    return count
+
+
+def read_records(path, file_format, fields):
+    """Yields the records of `path` as dicts of parsed values."""
+    with _open(path, 'r') as f:
+        if file_format == 'csv':
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(_decode(line)) for line in f
+                       if line.strip())
+        for record in records:
+            yield dict((name, parse(_decode(record.get(name))))
+                       for name, parse in fields.items())
@@ -0,0 +1,59 @@
+"""Hashtags and mentions found in tweet content.
+
+`#tag` and `@username` are only recognized at the start of the text or
+after a non-word character, so e-mail addresses and URL fragments such as
+`larry@example.com` or `page#2` are not picked up.
+"""
+import re
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+MAX_TAG_LENGTH = 40
+
+HASHTAG_RE = re.compile(r'(?<!\w)#(\w+)', re.UNICODE)
+MENTION_RE = re.compile(r'(?<!\w)@(\w+)', re.UNICODE)
+ENTITY_RE = re.compile(r'(?<!\w)([#@])(\w+)', re.UNICODE)
+
+
+def _distinct(values):
+    seen = []
+    for value in values:
+        if value not in seen:
+            seen.append(value)
+    return seen
+
+
+def extract_hashtags(text):
+    """Returns the distinct hashtags of `text`, lowercased and without the
+    leading `#`."""
+    return _distinct(
+        tag.lower()[:MAX_TAG_LENGTH] for tag in HASHTAG_RE.findall(text or ''))
+
+
+def extract_mentions(text):
+    """Returns the distinct usernames mentioned in `text`, without the
+    leading `@`."""
+    return _distinct(MENTION_RE.findall(text or ''))
+
+
+def linkify(text):
+    """Escapes `text` and turns its hashtags and mentions into links to the
+    tag page and the mentioned profile."""
+    text = text or ''
+    parts = []
+    position = 0
+    # Matched on the raw text: escaping first would turn quotes into
+    # entities like `&#39;` that look like hashtags.
+    for match in ENTITY_RE.finditer(text):
+        sigil, name = match.groups()
+        if sigil == '#':
+            href = '/tag/{}'.format(name.lower()[:MAX_TAG_LENGTH])
+        else:
+            href = '/{}'.format(name)
+        parts.append(escape(text[position:match.start()]))
+        parts.append('<a href="{}">{}{}</a>'.format(
+            escape(href), sigil, escape(name)))
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
@@ -0,0 +1,22 @@
+import hashlib
+import os
+
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+
+
+class ContentHashedImageFieldFile(ImageFieldFile):
+
+    def save(self, name, content, save=True):
+        sha1 = hashlib.sha1()
+        for chunk in content.chunks():
+            sha1.update(chunk)
+        extension = os.path.splitext(name)[1].lower()
+        super(ContentHashedImageFieldFile, self).save(
+            sha1.hexdigest() + extension, content, save)
+
+
+class ContentHashedImageField(models.ImageField):
+    """ImageField that names uploads after the SHA-1 of their content, so a
+    given URL always serves the same bytes and can be cached forever."""
+    attr_class = ContentHashedImageFieldFile
@@ -1,4 +1,5 @@
 from django import forms
+from django.contrib.auth import password_validation
 from django.core.exceptions import ValidationError
 
 from .models import Tweet, User
@@ -26,3 +27,67 @@ class ProfileForm(forms.ModelForm):
     class Meta:
         model = User
         fields = ('first_name', 'last_name', 'email', 'avatar', 'birth_date')
+
+
+class RegisterForm(forms.ModelForm):
+    password = forms.CharField(widget=forms.PasswordInput)
+    first_name = OnlyLettersField()
+    last_name = OnlyLettersField()
+    email = forms.EmailField()
+
+    class Meta:
+        model = User
+        fields = ('username', 'password', 'first_name', 'last_name', 'email',
+                  'birth_date', 'avatar')
+
+    def clean_password(self):
+        password = self.cleaned_data['password']
+        password_validation.validate_password(password)
+        return password
+
+    def save(self, commit=True):
+        user = super(RegisterForm, self).save(commit=False)
+        user.set_password(self.cleaned_data['password'])
+        user.is_active = False
+        user.email_validated = False
+        if commit:
+            user.save()
+        return user
+
+
+class NewPasswordForm(forms.Form):
+    new_password = forms.CharField(widget=forms.PasswordInput)
+    repeated_new_password = forms.CharField(widget=forms.PasswordInput)
+
+    def __init__(self, user, *args, **kwargs):
+        self.user = user
+        super(NewPasswordForm, self).__init__(*args, **kwargs)
+
+    def clean(self):
+        cleaned_data = super(NewPasswordForm, self).clean()
+        new_password = cleaned_data.get('new_password')
+        if new_password and (new_password !=
+                             cleaned_data.get('repeated_new_password')):
+            raise ValidationError('The two passwords do not match.')
+        if new_password:
+            password_validation.validate_password(new_password, self.user)
+        return cleaned_data
+
+    def save(self):
+        self.user.set_password(self.cleaned_data['new_password'])
+        self.user.save(update_fields=['password'])
+        return self.user
+
+
+class ChangePasswordForm(NewPasswordForm):
+    old_password = forms.CharField(widget=forms.PasswordInput)
+
+    def clean_old_password(self):
+        old_password = self.cleaned_data['old_password']
+        if not self.user.check_password(old_password):
+            raise ValidationError('Your old password is not correct.')
+        return old_password
+
+
+class ResetPasswordForm(forms.Form):
+    email = forms.EmailField()
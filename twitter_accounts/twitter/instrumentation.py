@@ -0,0 +1,151 @@
+"""Per-request performance instrumentation.
+
+`InstrumentationMiddleware` records, for every request, the number of SQL
+queries and the time spent running them, the time spent rendering
+templates and the total wall time. The numbers are sent back to the
+browser as a `Server-Timing` header and logged as one JSON line on the
+`twitter.instrumentation` logger.
+
+Both kinds of timing have a cost outside of the request being measured,
+so each has a setting. INSTRUMENTATION_QUERIES forces the debug cursor on
+every connection during the request, which times and logs every query.
+INSTRUMENTATION_TEMPLATES wraps `Template.render` for the whole process
+(the wrapper does nothing outside of an instrumented request). With a
+setting off, the numbers it provides are left out.
+
+Views can be given a query budget in QUERY_BUDGETS (keyed by the dotted
+path of the view). Going over budget logs a warning, or raises
+`QueryBudgetExceeded` when QUERY_BUDGET_STRICT is on, which makes the
+offending test fail.
+"""
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is None or metrics.template_depth:
+            # Not instrumenting, or a nested render (e.g. a template tag
+            # rendering a partial) already counted by the outer render.
+            return render(self, *args, **kwargs)
+        metrics.template_depth += 1
+        start = time.time()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.template_time += time.time() - start
+            metrics.template_depth -= 1
+    wrapper.instrumented = True
+    return wrapper
+
+
+def install_template_timer():
+    if not getattr(Template.render, 'instrumented', False):
+        Template.render = _timed_render(Template.render)
+
+
+class RequestMetrics(object):
+
+    def __init__(self):
+        self.start = time.time()
+        self.view = None
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.query_count = None
+        self.db_time = None
+        self.connections = []
+        if not settings.INSTRUMENTATION_QUERIES:
+            return
+        for connection in connections.all():
+            self.connections.append((
+                connection, connection.force_debug_cursor,
+                len(connection.queries_log)))
+            connection.force_debug_cursor = True
+
+    def finish(self):
+        self.wall_time = time.time() - self.start
+        if not self.connections:
+            return
+        self.query_count = 0
+        self.db_time = 0.0
+        for connection, force_debug_cursor, offset in self.connections:
+            connection.force_debug_cursor = force_debug_cursor
+            queries = list(connection.queries_log)[offset:]
+            self.query_count += len(queries)
+            self.db_time += sum(float(query['time']) for query in queries)
+
+    def server_timing(self):
+        metrics = []
+        if self.query_count is not None:
+            metrics.append('db;dur={:.2f};desc="{} queries"'.format(
+                self.db_time * 1000, self.query_count))
+        if settings.INSTRUMENTATION_TEMPLATES:
+            metrics.append('tpl;dur={:.2f}'.format(self.template_time * 1000))
+        metrics.append('total;dur={:.2f}'.format(self.wall_time * 1000))
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        data = {
+            'view': self.view,
+            'total_ms': round(self.wall_time * 1000, 2),
+        }
+        if self.query_count is not None:
+            data.update(queries=self.query_count,
+                        db_ms=round(self.db_time * 1000, 2))
+        if settings.INSTRUMENTATION_TEMPLATES:
+            data['template_ms'] = round(self.template_time * 1000, 2)
+        return data
+
+
+class InstrumentationMiddleware(object):
+
+    def __init__(self):
+        if settings.INSTRUMENTATION_TEMPLATES:
+            install_template_timer()
+
+    def process_request(self, request):
+        _local.metrics = RequestMetrics()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is not None:
+            metrics.view = '{}.{}'.format(
+                view_func.__module__, view_func.__name__)
+
+    def process_response(self, request, response):
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is None:
+            return response
+        del _local.metrics
+        metrics.finish()
+
+        response['Server-Timing'] = metrics.server_timing()
+        data = metrics.as_dict()
+        data.update(method=request.method, path=request.path,
+                    status=response.status_code)
+        logger.info(json.dumps(data, sort_keys=True))
+
+        budget = settings.QUERY_BUDGETS.get(metrics.view)
+        if budget is not None and metrics.query_count is not None and \
+                metrics.query_count > budget:
+            message = '{} ran {} queries, over its budget of {}'.format(
+                metrics.view, metrics.query_count, budget)
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,88 @@
+"""Live feed updates.
+
+Home feeds poll `/updates` with the cursor of the newest tweet they show.
+The view runs a single "newer than cursor" query on the timeline index and
+answers at once if it finds tweets. Otherwise the request parks on the
+broker until a tweet is fanned out to that user (or LIVE_UPDATES_TIMEOUT
+expires) and queries again, so idle connections cost two queries per
+timeout.
+
+A parked request holds its worker thread for the whole wait: one per open
+home feed tab. LIVE_UPDATES_MAX_WAITERS caps how many requests of a process
+wait at the same time, and must stay well below its thread count so other
+requests are still served; polls over the cap answer right away and tell
+the client to come back after LIVE_UPDATES_BUSY_DELAY seconds. Sites with
+many open tabs should serve `/updates` from async workers (e.g. gevent).
+
+The broker is pluggable through LIVE_UPDATES_BROKER. `LocalBroker` only
+wakes up waiters of the process that published the tweet; with several
+processes the others still pick new tweets up when their wait times out.
+A cross-process broker needs the same `publish`/`listen` methods.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class LocalBroker(object):
+    """In-process broker: every user with waiting requests gets an event
+    that publishing sets. A set event is dropped, so requests that start
+    listening afterwards get a fresh one and wait for the next tweet."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+        self._waiters = {}
+
+    def publish(self, user_ids):
+        with self._lock:
+            if not self._events:
+                return
+            for user_id in user_ids:
+                event = self._events.pop(user_id, None)
+                if event is not None:
+                    event.set()
+
+    @contextmanager
+    def listen(self, user_id):
+        """Yields an event set when something is published for `user_id`,
+        or None when LIVE_UPDATES_MAX_WAITERS requests already listen.
+        Listening starts before the caller queries, so a tweet published
+        in between is not missed."""
+        with self._lock:
+            if sum(self._waiters.values()) >= \
+                    settings.LIVE_UPDATES_MAX_WAITERS:
+                event = None
+            else:
+                event = self._events.setdefault(user_id, threading.Event())
+                self._waiters[user_id] = self._waiters.get(user_id, 0) + 1
+        try:
+            yield event
+        finally:
+            if event is not None:
+                with self._lock:
+                    self._waiters[user_id] -= 1
+                    if not self._waiters[user_id]:
+                        del self._waiters[user_id]
+                        self._events.pop(user_id, None)
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.LIVE_UPDATES_BROKER)()
+        return _broker
+
+
+def publish(user_ids):
+    """Wakes up the waiting requests of `user_ids` once the current
+    transaction commits, so they can see the new rows."""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: get_broker().publish(user_ids))
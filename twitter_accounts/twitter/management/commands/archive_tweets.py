@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from twitter.models import ArchivedTweet
+
+
+class Command(BaseCommand):
+    help = ('Moves tweets older than TWEET_ARCHIVE_DAYS days from the Tweet '
+            'table to the archive, oldest first, one batch per transaction, '
+            'so it can be stopped and run again at any time. Archived '
+            'tweets still show on profile pages but leave home timelines, '
+            'search and the hashtag and mention pages.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of tweets moved per batch.')
+
+    def handle(self, *args, **options):
+        archived = 0
+        while True:
+            moved = ArchivedTweet.objects.archive_batch(options['batch_size'])
+            if not moved:
+                break
+            archived += moved
+            if options['verbosity'] > 1:
+                self.stdout.write('Archived {} tweets'.format(archived))
+
+        if options['verbosity'] > 0:
+            self.stdout.write('Archived {} tweets.'.format(archived))
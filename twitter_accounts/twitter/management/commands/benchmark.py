@@ -0,0 +1,178 @@
+import json
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.utils.crypto import get_random_string
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from twitter.models import Tweet
+
+SCENARIOS = ('home', 'profile', 'follow', 'unfollow', 'tweet')
+
+SESSION_WRITE = re.compile(
+    r'\s*(INSERT INTO|UPDATE|DELETE FROM) ["`]?django_session\b', re.IGNORECASE)
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    rank = int(round(percent / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(rank, len(values) - 1))]
+
+
+class Command(BaseCommand):
+    help = ('Drives the feed, profile, follow/unfollow and tweet posting '
+            'views through the Django test client against the current '
+            'database (see seed_social_graph) and prints latency '
+            'percentiles, query counts and session table writes as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument(
+            '--warmup', type=int, default=20,
+            help='Requests per scenario run before measuring.')
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            help='Run only this scenario (may be repeated).')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--label', default='',
+            help='Free text stored in the report, e.g. a commit hash.')
+        parser.add_argument('--output', help='Write the report to this file.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        self.rng = random.Random(options['seed'])
+        self.max_pk = User.objects.aggregate(Max('pk'))['pk__max']
+        if not self.max_pk or User.objects.count() < 2:
+            raise CommandError(
+                'Not enough users to benchmark; run seed_social_graph first.')
+
+        report = {
+            'label': options['label'],
+            'iterations': options['iterations'],
+            'users': User.objects.count(),
+            'tweets': Tweet.objects.count(),
+            'scenarios': {},
+        }
+        # The test client always talks to "testserver", and the same few
+        # users would soon run into the rate limits.
+        # Tweets posted by the run are tagged with a random marker and
+        # deleted by pk afterwards, even if the run fails.
+        self.marker = 'benchmark tweet {}'.format(get_random_string(12))
+        self.tweet_pks = []
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'],
+                                   RATELIMITS={}):
+                for scenario in options['scenario'] or SCENARIOS:
+                    run = getattr(self, 'run_' + scenario)
+                    for _ in range(options['warmup']):
+                        run()
+                    samples = [run() for _ in range(options['iterations'])]
+                    report['scenarios'][scenario] = self.summarize(samples)
+        finally:
+            self.cleanup()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+    def summarize(self, samples):
+        latencies = sorted(latency for latency, _, _ in samples)
+        queries = sorted(count for _, count, _ in samples)
+        return {
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+            'queries_p50': percentile(queries, 50),
+            'queries_max': queries[-1],
+            'session_writes_max': max(writes for _, _, writes in samples),
+        }
+
+    def random_user(self):
+        User = get_user_model()
+        while True:
+            user = User.objects.filter(
+                pk__gte=self.rng.randint(1, self.max_pk)).order_by('pk').first()
+            if user is not None:
+                return user
+
+    def client_for(self, user):
+        client = Client()
+        client.force_login(user)
+        client.user = user
+        return client
+
+    def measure(self, request, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.time()
+            response = request(*args, **kwargs)
+            elapsed = time.time() - start
+        if response.status_code >= 400:
+            raise CommandError('{} {} returned {}'.format(
+                request.__name__.upper(), args[0], response.status_code))
+        session_writes = [
+            query for query in queries.captured_queries
+            if SESSION_WRITE.match(query['sql'])]
+        return elapsed, len(queries), len(session_writes)
+
+    def run_home(self):
+        client = self.client_for(self.random_user())
+        return self.measure(client.get, '/')
+
+    def run_profile(self):
+        return self.measure(
+            Client().get, '/{}'.format(self.random_user().username))
+
+    def _follow_pair(self):
+        follower = self.random_user()
+        followed = self.random_user()
+        while followed.pk == follower.pk:
+            followed = self.random_user()
+        return self.client_for(follower), followed
+
+    def run_follow(self):
+        client, followed = self._follow_pair()
+        was_following = client.user.is_following(followed)
+        if was_following:
+            client.post('/unfollow', {'username': followed.username})
+        sample = self.measure(
+            client.post, '/follow', {'username': followed.username})
+        if not was_following:
+            client.post('/unfollow', {'username': followed.username})
+        return sample
+
+    def run_unfollow(self):
+        client, followed = self._follow_pair()
+        was_following = client.user.is_following(followed)
+        if not was_following:
+            client.post('/follow', {'username': followed.username})
+        sample = self.measure(
+            client.post, '/unfollow', {'username': followed.username})
+        if was_following:
+            client.post('/follow', {'username': followed.username})
+        return sample
+
+    def run_tweet(self):
+        client = self.client_for(self.random_user())
+        sample = self.measure(client.post, '/', {'content': self.marker})
+        self.tweet_pks.append(Tweet.objects.filter(
+            user=client.user, content=self.marker).latest('pk').pk)
+        return sample
+
+    def cleanup(self):
+        """Deletes the tweets posted by this run, and only those."""
+        for start in range(0, len(self.tweet_pks), 500):
+            for tweet in Tweet.objects.filter(
+                    pk__in=self.tweet_pks[start:start + 500]):
+                tweet.delete()
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from twitter.models import Relationship
+from twitter.recommendations import FollowGraph, store_suggestions
+
+
+class Command(BaseCommand):
+    help = ('Computes the "who to follow" suggestions. By default only the '
+            'users whose friends-of-friends may have changed since the last '
+            'run are recomputed: the ones who followed or unfollowed someone '
+            'and their followers. Meant to run periodically, e.g. nightly.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true', default=False,
+            help='Recompute every user, reading the whole graph at once.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of users whose suggestions are stored per batch.')
+        parser.add_argument(
+            '--limit', type=int,
+            help='Suggestions kept per user (defaults to '
+                 'SUGGESTIONS_PER_USER).')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        batch_size = options['batch_size']
+        graph = FollowGraph(batch_size)
+
+        # Flags are cleared before the graph is read, so a follow happening
+        # during the run flags its user again for the next one.
+        if options['full']:
+            User.objects.filter(suggestions_stale=True).update(
+                suggestions_stale=False)
+            graph.load_all()
+            targets = list(User.objects.values_list('pk', flat=True))
+        else:
+            changed = list(User.objects.filter(
+                suggestions_stale=True).values_list('pk', flat=True))
+            targets = set(changed)
+            for start in range(0, len(changed), batch_size):
+                chunk = changed[start:start + batch_size]
+                User.objects.filter(pk__in=chunk).update(
+                    suggestions_stale=False)
+                targets.update(Relationship.objects.filter(
+                    following_id__in=chunk).values_list(
+                    'follower_id', flat=True))
+        targets = sorted(targets)
+
+        stored = 0
+        for start in range(0, len(targets), batch_size):
+            with transaction.atomic():
+                stored += store_suggestions(
+                    graph, targets[start:start + batch_size],
+                    options['limit'])
+            if options['verbosity'] > 1:
+                self.stdout.write('Computed {} users'.format(
+                    min(start + batch_size, len(targets))))
+
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                'Computed suggestions for {} users ({} suggestions).'.format(
+                    len(targets), stored))
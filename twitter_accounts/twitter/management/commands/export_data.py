@@ -0,0 +1,55 @@
+import itertools
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from twitter.dumps import DUMPS, FORMATS, dump_path, write_records
+from twitter.models import ArchivedTweet
+
+
+class Command(BaseCommand):
+    help = ('Exports users, tweets and follows to a directory, one file per '
+            'model, as newline-delimited JSON or CSV (see import_data). '
+            'Rows are read in primary key order, one chunk at a time, so '
+            'memory use does not grow with the size of the tables.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of rows read per query.')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for name, (label, fields) in DUMPS.items():
+            path = dump_path(directory, name, options['format'])
+            models = [apps.get_model(label)]
+            if name == 'tweets':
+                # Archived tweets go with the others; importing puts them
+                # back in the Tweet table until archive_tweets runs again.
+                models.append(ArchivedTweet)
+            count = write_records(
+                path, options['format'], list(fields),
+                itertools.chain.from_iterable(
+                    self.rows(model, list(fields), options['batch_size'])
+                    for model in models))
+            if options['verbosity'] > 0:
+                self.stdout.write('Exported {} {} to {}'.format(
+                    count, name, path))
+
+    def rows(self, model, fields, batch_size):
+        last_pk = 0
+        while True:
+            chunk = model.objects.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', *fields)[:batch_size]
+            read = 0
+            for row in chunk.iterator():
+                last_pk = row[0]
+                read += 1
+                yield row[1:]
+            if read < batch_size:
+                return
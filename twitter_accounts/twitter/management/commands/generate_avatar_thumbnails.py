@@ -0,0 +1,63 @@
+from multiprocessing.pool import ThreadPool
+
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from twitter.avatars import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generates the missing thumbnails of every uploaded avatar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.AVATAR_THUMBNAIL_WORKERS,
+            help='Number of avatars processed in parallel.')
+        parser.add_argument(
+            '--force', action='store_true', default=False,
+            help='Regenerate thumbnails that already exist.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of avatar names read from the database at once.')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        pool = ThreadPool(options['workers'])
+        avatars = written = failed = 0
+        try:
+            for names in self._avatar_names(options['batch_size']):
+                for result in pool.imap_unordered(
+                        lambda name: self._generate(name, force), names):
+                    avatars += 1
+                    if result is None:
+                        failed += 1
+                    else:
+                        written += result
+        finally:
+            pool.close()
+            pool.join()
+        self.stdout.write(
+            'Processed {} avatars: {} thumbnails written, {} failed.'.format(
+                avatars, written, failed))
+
+    def _avatar_names(self, batch_size):
+        """Yields avatar names in batches, reading them on the main thread
+        so the workers never touch the database."""
+        users = get_user_model().objects.exclude(avatar='').exclude(
+            avatar=None).order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(users.filter(pk__gt=last_pk).values_list(
+                'pk', 'avatar')[:batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1][0]
+            yield [name for _, name in batch]
+
+    def _generate(self, name, force):
+        try:
+            return generate_thumbnails(name, force=force)
+        except Exception as e:
+            self.stderr.write('{}: {}'.format(name, e))
+            return None
@@ -0,0 +1,194 @@
+import itertools
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from twitter.db import LOOKUP_BATCH_SIZE, insert_rows
+from twitter.dumps import DUMPS, FORMATS, dump_path, read_records
+from twitter.models import (
+    ImportCheckpoint, Relationship, TimelineEntry, Tweet)
+
+
+def without_nulls(record):
+    """Leaves missing values to the model field defaults."""
+    return dict((name, value) for name, value in record.items()
+                if value is not None)
+
+
+class Command(BaseCommand):
+    help = ('Imports a directory written by export_data. Rows are inserted '
+            'in batches with one prepared statement each, and users get new '
+            'ids (the ids of '
+            'the dump are remapped in tweets and follows). Users whose '
+            'username already exists are matched to the existing account. '
+            'Progress is saved with every batch, so an interrupted import '
+            'resumes where it stopped when run again. Tweets are inserted '
+            'without the models, so run reindex_tweets (search, hashtags '
+            'and mentions) and then rebuild_stats afterwards to index and '
+            'count them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of rows inserted per transaction.')
+        parser.add_argument(
+            '--skip-timelines', action='store_true', default=False,
+            help='Do not rebuild the home timelines of the imported users.')
+
+    def handle(self, *args, **options):
+        self.directory = options['directory']
+        self.format = options['format']
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        for name in DUMPS:
+            if not os.path.exists(self.path(name)):
+                raise CommandError('{} does not exist.'.format(
+                    self.path(name)))
+        self.checkpoint = dict(ImportCheckpoint.objects.filter(
+            path__in=[self.path(name) for name in DUMPS]).values_list(
+            'path', 'done'))
+        if self.checkpoint:
+            self.log('Resuming from {}'.format(self.checkpoint), 1)
+
+        user_ids = self.import_users()
+        tweets, skipped = self.import_tweets(user_ids)
+        follows = self.import_follows(user_ids)
+
+        call_command('repair_follow_counts', verbosity=0)
+        if not options['skip_timelines']:
+            self.rebuild_timelines(sorted(set(user_ids.values())))
+        ImportCheckpoint.objects.filter(path__in=list(self.checkpoint)).delete()
+
+        self.log('Imported {} users, {} tweets and {} follows ({} tweets of '
+                 'unknown users skipped).'.format(
+                     len(user_ids), tweets, follows, skipped), 1)
+
+    def log(self, message, verbosity=2):
+        if self.verbosity >= verbosity:
+            self.stdout.write(message)
+
+    def path(self, name):
+        return os.path.abspath(dump_path(self.directory, name, self.format))
+
+    def save_checkpoint(self, name, done):
+        """Records that the first `done` records of the `name` dump are
+        loaded. Must run in the transaction that loads them."""
+        path = self.path(name)
+        ImportCheckpoint.objects.update_or_create(
+            path=path, defaults={'done': done})
+        self.checkpoint[path] = done
+        self.log('Imported {} {}'.format(done, name))
+
+    def batches(self, name, resume=True):
+        """Yields `(batch, done)`: the records of the `name` dump in
+        batches, and how many records are loaded once the batch is. The
+        caller passes `done` to `save_checkpoint` in the transaction that
+        loads the batch, so it is skipped when resuming exactly if it was
+        committed."""
+        done = self.checkpoint.get(self.path(name), 0) if resume else 0
+        records = itertools.islice(
+            read_records(self.path(name), self.format, DUMPS[name][1]),
+            done, None)
+        while True:
+            batch = list(itertools.islice(records, self.batch_size))
+            if not batch:
+                return
+            done += len(batch)
+            yield batch, done
+
+    def import_users(self):
+        """Creates the users of the dump and returns a dict mapping their
+        ids in the dump to their new ids. Running it again only rebuilds
+        the mapping, which is why users are never skipped on resume."""
+        User = get_user_model()
+        user_ids = {}
+        for batch, _ in self.batches('users', resume=False):
+            for start in range(0, len(batch), LOOKUP_BATCH_SIZE):
+                chunk = batch[start:start + LOOKUP_BATCH_SIZE]
+                usernames = [record['username'] for record in chunk]
+                with transaction.atomic():
+                    existing = set(User.objects.filter(
+                        username__in=usernames).values_list(
+                        'username', flat=True))
+                    User.objects.bulk_create([
+                        User(**without_nulls(dict(record, id=None)))
+                        for record in chunk
+                        if record['username'] not in existing])
+                pks = dict(User.objects.filter(
+                    username__in=usernames).values_list('username', 'pk'))
+                for record in chunk:
+                    user_ids[record['id']] = pks[record['username']]
+        return user_ids
+
+    def import_tweets(self, user_ids):
+        imported = skipped = 0
+        for batch, done in self.batches('tweets'):
+            now = timezone.now()
+            rows = []
+            for record in batch:
+                user_id = record['user_id']
+                if user_id is not None:
+                    user_id = user_ids.get(user_id)
+                    if user_id is None:
+                        skipped += 1
+                        continue
+                rows.append((user_id, record['content'],
+                             record['created'] or now))
+            with transaction.atomic():
+                insert_rows(Tweet, ('user', 'content', 'created'), rows)
+                self.save_checkpoint('tweets', done)
+            imported += len(rows)
+        return imported, skipped
+
+    def import_follows(self, user_ids):
+        imported = 0
+        for batch, done in self.batches('follows'):
+            pairs = set()
+            for record in batch:
+                pair = (user_ids.get(record['follower_id']),
+                        user_ids.get(record['following_id']))
+                if None not in pair and pair[0] != pair[1]:
+                    pairs.add(pair)
+            try:
+                with transaction.atomic():
+                    insert_rows(Relationship, ('follower', 'following'),
+                                pairs)
+                    self.save_checkpoint('follows', done)
+            except IntegrityError:
+                # Some already exist (merging into existing data): only
+                # insert the others.
+                pairs = self.new_pairs(sorted(pairs))
+                with transaction.atomic():
+                    insert_rows(Relationship, ('follower', 'following'),
+                                pairs)
+                    self.save_checkpoint('follows', done)
+            imported += len(pairs)
+        return imported
+
+    def new_pairs(self, pairs):
+        new = []
+        for start in range(0, len(pairs), LOOKUP_BATCH_SIZE):
+            chunk = pairs[start:start + LOOKUP_BATCH_SIZE]
+            existing = set(Relationship.objects.filter(
+                follower_id__in=set(follower for follower, _ in chunk),
+                following_id__in=set(pk for _, pk in chunk),
+            ).values_list('follower_id', 'following_id'))
+            new.extend(pair for pair in chunk if pair not in existing)
+        return new
+
+    def rebuild_timelines(self, pks):
+        User = get_user_model()
+        for start in range(0, len(pks), self.batch_size):
+            batch = pks[start:start + self.batch_size]
+            for offset in range(0, len(batch), LOOKUP_BATCH_SIZE):
+                for user in User.objects.filter(
+                        pk__in=batch[offset:offset + LOOKUP_BATCH_SIZE]):
+                    TimelineEntry.objects.rebuild(user)
+            self.log('Rebuilt {} timelines'.format(
+                min(start + self.batch_size, len(pks))))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from twitter.models import ValidationToken
+
+
+class Command(BaseCommand):
+    help = ('Deletes expired validation tokens in small batches, so the '
+            'table is never locked for long.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of tokens deleted per statement.')
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to pause between batches.')
+
+    def handle(self, *args, **options):
+        deleted = 0
+        while True:
+            pks = list(ValidationToken.objects.expired().values_list(
+                'pk', flat=True)[:options['batch_size']])
+            if not pks:
+                break
+            ValidationToken.objects.filter(pk__in=pks).delete()
+            deleted += len(pks)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                'Deleted {} expired validation tokens.'.format(deleted))
@@ -0,0 +1,91 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from twitter.models import (
+    DailyActiveUser, DailyStats, Hashtag, HashtagCount, HourlyTweetCount,
+    Tweet, stats_day, stats_hour)
+
+
+class Command(BaseCommand):
+    help = ('Re-syncs the dashboard rollups of the last few days with the '
+            'Tweet, Hashtag and User tables, catching up on rows written '
+            'without going through the models (bulk loads, imports; run '
+            'reindex_tweets first for their hashtags). Follow and '
+            'unfollow counts are only maintained incrementally and are '
+            'left untouched. Hourly hashtag counters older than the window '
+            'are purged. Meant to run periodically, e.g. hourly.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=2,
+            help='Number of days to re-sync, today included.')
+
+    def handle(self, *args, **options):
+        today = stats_day(timezone.now())
+        days = [today - timedelta(days=offset)
+                for offset in range(options['days'])]
+        for day in sorted(days):
+            self.rebuild_day(day)
+
+        purged, _ = DailyActiveUser.objects.filter(date__lt=days[-1]).delete()
+        purged += HashtagCount.objects.filter(
+            hour__lt=self.day_start(days[-1])).delete()[0]
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                'Rebuilt stats for {} days, purged {} old rows.'.format(
+                    len(days), purged))
+
+    def day_start(self, day):
+        return timezone.make_aware(
+            datetime.combine(day, time.min), timezone.get_current_timezone())
+
+    def rebuild_day(self, day):
+        start = self.day_start(day)
+        end = start + timedelta(days=1)
+
+        hourly = defaultdict(int)
+        authors = set()
+        tweets = Tweet.objects.filter(
+            created__gte=start, created__lt=end).values_list(
+            'created', 'user_id')
+        for created, user_id in tweets.iterator():
+            hourly[stats_hour(created)] += 1
+            if user_id is not None:
+                authors.add(user_id)
+        tags = defaultdict(int)
+        hashtags = Hashtag.objects.filter(
+            created__gte=start, created__lt=end).values_list('tag', 'created')
+        for tag, created in hashtags.iterator():
+            tags[tag, stats_hour(created)] += 1
+        signups = get_user_model().objects.filter(
+            date_joined__gte=start, date_joined__lt=end).count()
+
+        with transaction.atomic():
+            known = set(DailyActiveUser.objects.filter(
+                date=day).values_list('user_id', flat=True))
+            DailyActiveUser.objects.bulk_create(
+                [DailyActiveUser(date=day, user_id=user_id)
+                 for user_id in authors - known])
+            DailyStats.objects.update_or_create(date=day, defaults={
+                'signups': signups,
+                'tweets': sum(hourly.values()),
+                'active_users': len(known | authors),
+            })
+            HourlyTweetCount.objects.filter(
+                hour__gte=start, hour__lt=end).exclude(
+                hour__in=list(hourly)).delete()
+            for hour, count in hourly.items():
+                HourlyTweetCount.objects.update_or_create(
+                    hour=hour, defaults={'tweets': count})
+            for (tag, hour), count in tags.items():
+                HashtagCount.objects.update_or_create(
+                    tag=tag, hour=hour, defaults={'tweets': count})
+            stale = HashtagCount.objects.filter(hour__gte=start, hour__lt=end)
+            for tag, hour in stale.values_list('tag', 'hour'):
+                if (tag, hour) not in tags:
+                    stale.filter(tag=tag, hour=hour).delete()
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from twitter.db import LOOKUP_BATCH_SIZE
+from twitter.entities import extract_hashtags, extract_mentions
+from twitter.models import Hashtag, Mention, Posting, Tweet
+from twitter.search import tokenize
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the search, hashtag and mention indexes from the Tweet '
+            'table. Tweets are read in primary key order, one batch at a '
+            'time, so memory use does not grow with the size of the table. '
+            'Run it after upgrading to index the tweets written before '
+            'those indexes existed, and after loading tweets without the '
+            'models (e.g. import_data).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of tweets indexed per batch.')
+        parser.add_argument(
+            '--clear', action='store_true', default=False,
+            help='Empty the indexes first instead of replacing the rows '
+                 'of each tweet.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        indexes = (Posting, Hashtag, Mention)
+        if options['clear']:
+            for model in indexes:
+                model.objects.all().delete()
+
+        indexed = 0
+        counts = dict((model, 0) for model in indexes)
+        last_pk = 0
+        while True:
+            tweets = list(
+                Tweet.objects.filter(pk__gt=last_pk)
+                .order_by('pk').values_list('pk', 'content', 'created')
+                [:batch_size])
+            if not tweets:
+                break
+            last_pk = tweets[-1][0]
+            rows = {
+                Posting: [
+                    Posting(term=term, tweet_id=pk, created=created)
+                    for pk, content, created in tweets
+                    for term in tokenize(content)],
+                Hashtag: [
+                    Hashtag(tag=tag, tweet_id=pk, created=created)
+                    for pk, content, created in tweets
+                    for tag in extract_hashtags(content)],
+                Mention: self.mentions(tweets),
+            }
+
+            with transaction.atomic():
+                if not options['clear']:
+                    pks = [pk for pk, _, _ in tweets]
+                    for model in indexes:
+                        model.objects.filter(tweet_id__in=pks).delete()
+                for model in indexes:
+                    model.objects.bulk_create(rows[model])
+                    counts[model] += len(rows[model])
+            indexed += len(tweets)
+            if options['verbosity'] > 1:
+                self.stdout.write('Indexed {} tweets'.format(indexed))
+
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                'Indexed {} tweets, {} postings, {} hashtags, {} '
+                'mentions.'.format(indexed, counts[Posting], counts[Hashtag],
+                                   counts[Mention]))
+
+    def mentions(self, tweets):
+        names = dict((pk, extract_mentions(content))
+                     for pk, content, _ in tweets)
+        usernames = sorted(set(
+            name for tweet_names in names.values() for name in tweet_names))
+        user_ids = {}
+        for start in range(0, len(usernames), LOOKUP_BATCH_SIZE):
+            user_ids.update(get_user_model().objects.filter(
+                username__in=usernames[start:start + LOOKUP_BATCH_SIZE])
+                .values_list('username', 'pk'))
+        return [
+            Mention(user_id=user_ids[name], tweet_id=pk, created=created)
+            for pk, _, created in tweets
+            for name in names[pk] if name in user_ids]
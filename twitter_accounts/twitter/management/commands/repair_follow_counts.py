@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+
+from twitter.db import LOOKUP_BATCH_SIZE
+from twitter.models import Relationship
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the denormalized following/followers counters of '
+            'every user from the Relationship table and fixes the ones '
+            'that drifted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of users checked per batch.')
+        parser.add_argument(
+            '--dry-run', action='store_true', default=False,
+            help='Report drifted counters without fixing them.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        batch_size = options['batch_size']
+        checked = repaired = 0
+        last_pk = 0
+        while True:
+            users = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', 'following_count', 'followers_count')[:batch_size])
+            if not users:
+                break
+            last_pk = users[-1][0]
+            pks = [pk for pk, _, _ in users]
+            following = self._count(pks, 'follower_id')
+            followers = self._count(pks, 'following_id')
+
+            with transaction.atomic():
+                for pk, following_count, followers_count in users:
+                    expected = (following.get(pk, 0), followers.get(pk, 0))
+                    if expected == (following_count, followers_count):
+                        continue
+                    repaired += 1
+                    if options['verbosity'] > 1:
+                        self.stdout.write(
+                            'User {}: {}/{} -> {}/{}'.format(
+                                pk, following_count, followers_count,
+                                *expected))
+                    if not options['dry_run']:
+                        User.objects.filter(pk=pk).update(
+                            following_count=expected[0],
+                            followers_count=expected[1])
+            checked += len(users)
+
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                'Checked {} users, {} {} drifted counters.'.format(
+                    checked, 'found' if options['dry_run'] else 'repaired',
+                    repaired))
+
+    def _count(self, pks, column):
+        counts = {}
+        for start in range(0, len(pks), LOOKUP_BATCH_SIZE):
+            counts.update(
+                Relationship.objects.filter(
+                    **{column + '__in': pks[start:start + LOOKUP_BATCH_SIZE]})
+                .values_list(column).annotate(Count('id')).order_by())
+        return counts
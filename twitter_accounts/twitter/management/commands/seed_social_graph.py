@@ -0,0 +1,160 @@
+import bisect
+import random
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from twitter.models import Relationship, TimelineEntry, Tweet
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua django '
+         'python tweet feed follow timeline cache index query').split()
+
+
+class Command(BaseCommand):
+    help = ('Seeds a synthetic social graph for benchmarking: users, a '
+            'power-law distributed follow graph and tweets. Every user gets '
+            'the password "password". The same --seed always produces the '
+            'same graph.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--tweets', type=int, default=10000)
+        parser.add_argument(
+            '--avg-following', type=int, default=50,
+            help='Average number of accounts followed per user.')
+        parser.add_argument(
+            '--alpha', type=float, default=1.0,
+            help='Exponent of the popularity power law (higher means a few '
+                 'accounts get most of the followers and tweets).')
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Tweets are spread over this many past days.')
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--skip-timelines', action='store_true', default=False,
+            help='Do not precompute home timelines (much faster on very '
+                 'large graphs).')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                'Users named "{}*" already exist; pick another --prefix.'
+                .format(prefix))
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+
+        user_pks = self.create_users(User, prefix, options['users'])
+        popularity = self.power_law(user_pks, options['alpha'])
+        activity = self.power_law(user_pks, options['alpha'])
+        follows = self.create_relationships(
+            user_pks, popularity, options['avg_following'])
+        self.create_tweets(activity, options['tweets'], options['days'])
+
+        # Its own batch size keeps its id lists under SQLite's limits.
+        call_command('repair_follow_counts', verbosity=0)
+        if not options['skip_timelines']:
+            for done, user in enumerate(
+                    User.objects.filter(
+                        username__startswith=prefix).iterator(), 1):
+                TimelineEntry.objects.rebuild(user)
+                if done % self.batch_size == 0:
+                    self.log('Rebuilt {} timelines'.format(done))
+
+        self.stdout.write('Seeded {} users, {} follows and {} tweets.'.format(
+            len(user_pks), follows, options['tweets']))
+
+    def log(self, message):
+        if self.verbosity > 1:
+            self.stdout.write(message)
+
+    def chunks(self, iterable):
+        chunk = []
+        for item in iterable:
+            chunk.append(item)
+            if len(chunk) == self.batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def power_law(self, pks, alpha):
+        """Returns a sampler picking one of `pks` at random, the k-th most
+        popular (in a random order) with a probability proportional to
+        1 / k ** alpha."""
+        ranked = list(pks)
+        self.rng.shuffle(ranked)
+        cumulative = []
+        total = 0.0
+        for rank in range(1, len(ranked) + 1):
+            total += 1.0 / rank ** alpha
+            cumulative.append(total)
+
+        def sample():
+            position = bisect.bisect_left(cumulative, self.rng.random() * total)
+            return ranked[min(position, len(ranked) - 1)]
+        return sample
+
+    def create_users(self, User, prefix, count):
+        password = make_password('password')
+        now = timezone.now()
+        for chunk in self.chunks(range(count)):
+            User.objects.bulk_create([
+                User(username='{}{:07d}'.format(prefix, i), password=password,
+                     email='{}{:07d}@example.com'.format(prefix, i),
+                     date_joined=now)
+                for i in chunk])
+            self.log('Created {} users'.format(chunk[-1] + 1))
+        return list(User.objects.filter(
+            username__startswith=prefix).order_by('pk').values_list(
+            'pk', flat=True))
+
+    def create_relationships(self, user_pks, popularity, avg_following):
+        def relationships():
+            for follower in user_pks:
+                # Pareto(2) has a mean of 2, so this averages avg_following
+                wanted = min(len(user_pks) - 1, int(
+                    avg_following * self.rng.paretovariate(2.0) / 2))
+                following = set()
+                for _ in range(wanted * 3):
+                    if len(following) >= wanted:
+                        break
+                    pk = popularity()
+                    if pk != follower:
+                        following.add(pk)
+                for pk in sorted(following):
+                    yield Relationship(follower_id=follower, following_id=pk)
+
+        created = 0
+        for chunk in self.chunks(relationships()):
+            Relationship.objects.bulk_create(chunk)
+            created += len(chunk)
+            self.log('Created {} follows'.format(created))
+        return created
+
+    def create_tweets(self, activity, count, days):
+        now = timezone.now()
+        span = days * 24 * 60 * 60
+
+        def tweets():
+            for i in range(count):
+                words = self.rng.sample(WORDS, self.rng.randint(3, 12))
+                yield Tweet(
+                    user_id=activity(),
+                    content=' '.join(words)[:140],
+                    created=now - timedelta(seconds=self.rng.random() * span))
+
+        created = 0
+        for chunk in self.chunks(tweets()):
+            Tweet.objects.bulk_create(chunk)
+            created += len(chunk)
+            self.log('Created {} tweets'.format(created))
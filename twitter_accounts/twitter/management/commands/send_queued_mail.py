@@ -0,0 +1,71 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from twitter.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    help = ('Sends queued emails in batches over a single connection to '
+            'the email backend, retrying failures with exponential backoff. '
+            'Each batch is claimed first, so several workers can run at '
+            'once without sending an email twice.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.EMAIL_QUEUE_BATCH_SIZE,
+            help='Number of emails sent per connection.')
+        parser.add_argument(
+            '--loop', action='store_true', default=False,
+            help='Keep polling the queue instead of exiting once drained.')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds between polls when --loop is given.')
+
+    def handle(self, *args, **options):
+        sent = failed = 0
+        worker = '{}:{}'.format(socket.gethostname(), os.getpid())
+        while True:
+            batch = OutgoingEmail.objects.claim(worker, options['batch_size'])
+            if not batch:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            batch_sent, batch_failed = self.send_batch(batch)
+            sent += batch_sent
+            failed += batch_failed
+            if batch_sent == 0 and not options['loop']:
+                # everything in this batch failed; leave retries for later
+                break
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                'Sent {} emails, {} failed.'.format(sent, failed))
+
+    def send_batch(self, emails):
+        sent = failed = 0
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            for email in emails:
+                email.mark_failed(str(e))
+            return 0, len(emails)
+        try:
+            for email in emails:
+                try:
+                    email.as_message(connection).send()
+                except Exception as e:
+                    email.mark_failed(str(e))
+                    failed += 1
+                else:
+                    email.mark_sent()
+                    sent += 1
+        finally:
+            connection.close()
+        return sent, failed
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:27
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_timelines(apps, schema_editor):
+    Tweet = apps.get_model('twitter', 'Tweet')
+    Relationship = apps.get_model('twitter', 'Relationship')
+    TimelineEntry = apps.get_model('twitter', 'TimelineEntry')
+    db = schema_editor.connection.alias
+    for tweet in Tweet.objects.using(db).exclude(user=None).iterator():
+        user_ids = set(Relationship.objects.using(db).filter(
+            following_id=tweet.user_id).values_list('follower_id', flat=True))
+        user_ids.add(tweet.user_id)
+        TimelineEntry.objects.using(db).bulk_create(
+            [TimelineEntry(user_id=user_id, tweet_id=tweet.id,
+                           created=tweet.created)
+             for user_id in user_ids],
+            batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(null=True)),
+                ('tweet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='twitter.Tweet')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created', '-tweet'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together=set([('user', 'tweet')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='timelineentry',
+            index_together=set([('user', 'created')]),
+        ),
+        migrations.RunPython(populate_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:28
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0002_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='timelineentry',
+            index_together=set([('user', 'created', 'tweet')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='tweet',
+            index_together=set([('user', 'created', 'id')]),
+        ),
+    ]
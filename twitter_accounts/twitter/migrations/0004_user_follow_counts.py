@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:28
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_follow_counts(apps, schema_editor):
+    User = apps.get_model('twitter', 'User')
+    Relationship = apps.get_model('twitter', 'Relationship')
+    db = schema_editor.connection.alias
+    for field, column in (('following_count', 'follower_id'),
+                          ('followers_count', 'following_id')):
+        counts = Relationship.objects.using(db).values_list(column).annotate(
+            Count('id')).order_by()
+        for user_id, count in counts:
+            User.objects.using(db).filter(pk=user_id).update(**{field: count})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0003_feed_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_follow_counts,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:29
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count, F, Min
+
+
+def remove_duplicate_relationships(apps, schema_editor):
+    User = apps.get_model('twitter', 'User')
+    Relationship = apps.get_model('twitter', 'Relationship')
+    db = schema_editor.connection.alias
+    duplicates = Relationship.objects.using(db).values(
+        'follower_id', 'following_id').annotate(
+        first=Min('id'), copies=Count('id')).filter(copies__gt=1).order_by()
+    for duplicate in duplicates:
+        extra = duplicate['copies'] - 1
+        Relationship.objects.using(db).filter(
+            follower_id=duplicate['follower_id'],
+            following_id=duplicate['following_id'],
+        ).exclude(id=duplicate['first']).delete()
+        User.objects.using(db).filter(
+            pk=duplicate['follower_id'], following_count__gte=extra,
+        ).update(following_count=F('following_count') - extra)
+        User.objects.using(db).filter(
+            pk=duplicate['following_id'], followers_count__gte=extra,
+        ).update(followers_count=F('followers_count') - extra)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0004_user_follow_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_relationships,
+                             migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='relationship',
+            unique_together=set([('follower', 'following')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='relationship',
+            index_together=set([('following', 'follower')]),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:35
+from __future__ import unicode_literals
+
+from django.db import migrations
+import twitter.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0006_user_updated'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=twitter.fields.ContentHashedImageField(blank=True, null=True, upload_to='avatars/'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:36
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0007_avatar_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tweet',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True),
+        ),
+    ]
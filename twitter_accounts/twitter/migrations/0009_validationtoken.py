@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+import twitter.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0008_tweet_created_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidationToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(db_index=True, max_length=254)),
+                ('token', models.CharField(max_length=64, unique=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires', models.DateTimeField(db_index=True, default=twitter.models.default_token_expiry)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='email_validated',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:44
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0011_dashboard_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Posting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=40)),
+                ('created', models.DateTimeField()),
+                ('tweet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='twitter.Tweet')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='posting',
+            unique_together=set([('term', 'tweet')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='posting',
+            index_together=set([('term', 'created', 'tweet')]),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:46
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0012_search_postings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hashtag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=40)),
+                ('created', models.DateTimeField()),
+                ('tweet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hashtags', to='twitter.Tweet')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HashtagCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=40)),
+                ('hour', models.DateTimeField()),
+                ('tweets', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Mention',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField()),
+                ('tweet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='twitter.Tweet')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='hashtagcount',
+            unique_together=set([('tag', 'hour')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='hashtagcount',
+            index_together=set([('hour', 'tag')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mention',
+            unique_together=set([('user', 'tweet')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='mention',
+            index_together=set([('user', 'created', 'tweet')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='hashtag',
+            unique_together=set([('tag', 'tweet')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='hashtag',
+            index_together=set([('tag', 'created', 'tweet')]),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 12:47
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0013_hashtags_mentions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Suggestion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ['-score', 'suggested'],
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='suggestions_stale',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.AddField(
+            model_name='suggestion',
+            name='suggested',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='suggestion',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='suggestion',
+            unique_together=set([('user', 'suggested')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='suggestion',
+            index_together=set([('user', 'score')]),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 13:09
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0014_suggestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTweet',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('content', models.CharField(blank=True, max_length=140)),
+                ('created', models.DateTimeField(null=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='archivedtweet',
+            index_together=set([('user', 'created', 'id')]),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 14:05
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0016_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='validationtoken',
+            name='purpose',
+            field=models.CharField(blank=True, choices=[('validate', 'Validate email'), ('reset', 'Reset password')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='validationtoken',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
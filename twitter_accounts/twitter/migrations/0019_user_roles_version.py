@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 13:29
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0018_outgoingemail_claim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='roles_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
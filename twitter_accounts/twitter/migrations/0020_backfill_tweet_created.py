@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 15:10
+from __future__ import unicode_literals
+
+from datetime import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def backfill_created(apps, schema_editor):
+    # The date of these tweets is unknown: date them at the epoch, so they
+    # stay the oldest of their author's tweets.
+    db = schema_editor.connection.alias
+    for name in ('Tweet', 'ArchivedTweet'):
+        model = apps.get_model('twitter', name)
+        model.objects.using(db).filter(created__isnull=True).update(
+            created=EPOCH)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0019_user_roles_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_created, migrations.RunPython.noop),
+    ]
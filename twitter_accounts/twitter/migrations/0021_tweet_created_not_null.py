@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 15:11
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0020_backfill_tweet_created'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedtweet',
+            name='created',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='tweet',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,41 +1,458 @@
-from django.db import models
+import calendar
+from datetime import timedelta
+
+from django.db import models, router, transaction, IntegrityError
+from django.db.models import F, Q, Sum
 from django.conf import settings
+from django.core.mail import EmailMessage
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .db import LOOKUP_BATCH_SIZE, insert_rows
+from .entities import MAX_TAG_LENGTH, extract_hashtags, extract_mentions
+from .fields import ContentHashedImageField
+from .live import publish
+from .pagination import after_cursor, cut_page, newer_than, paginate
+from .search import (
+    MAX_QUERY_TERMS, MAX_TERM_LENGTH, decode_search_cursor,
+    encode_search_cursor, tokenize)
 
 
 class Tweet(models.Model):
     class Meta:
         ordering = ['-created']
+        index_together = [('user', 'created', 'id')]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True)
     content = models.CharField(max_length=140, blank=True)
-    created = models.DateTimeField(auto_now_add=True, null=True)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def save(self, *args, **kwargs):
+        adding = self.pk is None
+        # The tweet is only kept if its timelines, indexes and stats could
+        # be written too.
+        with transaction.atomic():
+            super(Tweet, self).save(*args, **kwargs)
+            if adding:
+                TimelineEntry.objects.fan_out(self)
+                DailyStats.objects.record_tweet(self)
+            Posting.objects.index(self, replace=not adding)
+            tags = Hashtag.objects.index(self, replace=not adding)
+            Mention.objects.index(self, replace=not adding)
+            if adding:
+                HashtagCount.objects.record(tags, self.created)
+
+    @property
+    def card_cache_key(self):
+        """Cache key of the rendered tweet card. It embeds the author's
+        last update time, so editing the profile invalidates every card of
+        that author at once."""
+        return 'tweet-card:{}:{}'.format(
+            self.pk, self.user.cache_version if self.user_id else 0)
+
+
+class ArchivedTweetManager(models.Manager):
+
+    def horizon(self):
+        """Tweets created before this may have been archived."""
+        return timezone.now() - timedelta(days=settings.TWEET_ARCHIVE_DAYS)
+
+    def archive_batch(self, batch_size):
+        """Moves up to `batch_size` of the oldest tweets created before the
+        horizon to the archive. Returns how many were moved."""
+        fields = ('id', 'user_id', 'content', 'created')
+        # Everything is read and written on the primary, in one
+        # transaction: a replica may lag behind, and reads of Tweet are
+        # routed to one.
+        db = router.db_for_write(Tweet)
+        with transaction.atomic(using=db):
+            rows = list(Tweet.objects.using(db)
+                        .filter(created__lt=self.horizon())
+                        .order_by('created', 'id')
+                        .values_list(*fields)[:batch_size])
+            if not rows:
+                return 0
+            ids = [row[0] for row in rows]
+            insert_rows(self.model, fields, rows, using=db)
+            for model in (TimelineEntry, Posting, Hashtag, Mention):
+                model.objects.using(db).filter(tweet_id__in=ids).delete()
+            # Nothing refers to these tweets anymore, and their pages do not
+            # change (they are read from the archive now), so skip the
+            # per-tweet delete signals.
+            Tweet.objects.using(db).filter(pk__in=ids)._raw_delete(db)
+        return len(rows)
+
+
+class ArchivedTweet(models.Model):
+    """A tweet moved out of the `Tweet` table by the `archive_tweets`
+    command, with the same id. Profile pages read it (see
+    `User.tweets_page`), but it is no longer in timelines, search or the
+    hashtag and mention indexes."""
+    class Meta:
+        ordering = ['-created']
+        index_together = [('user', 'created', 'id')]
+
+    id = models.IntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, related_name='+')
+    content = models.CharField(max_length=140, blank=True)
+    created = models.DateTimeField()
+
+    objects = ArchivedTweetManager()
+
+    # Same ids, same cards.
+    card_cache_key = Tweet.card_cache_key
 
 
 class Relationship(models.Model):
+    class Meta:
+        unique_together = ('follower', 'following')
+        index_together = [('following', 'follower')]
+
     follower = models.ForeignKey(settings.AUTH_USER_MODEL)
     following = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+')
 
 
+class PostingManager(models.Manager):
+
+    def index(self, tweet, replace=False):
+        """Writes the postings of `tweet`, replacing its previous ones when
+        `replace` is set (i.e. the tweet may have been indexed before)."""
+        if replace:
+            self.filter(tweet=tweet).delete()
+        self.bulk_create([
+            Posting(term=term, tweet_id=tweet.pk, created=tweet.created)
+            for term in tokenize(tweet.content)])
+
+    def search(self, query, cursor=None, page_size=None):
+        """Returns `(tweets, next_cursor)` for the tweets containing any of
+        the terms of `query`, the ones matching most terms first and the
+        newest first among those. Only the newest SEARCH_MAX_CANDIDATES
+        postings of each term are considered, each read with a range scan
+        of the `(term, created, tweet)` index and ranked here, so a page
+        costs the same however common the terms are."""
+        terms = tokenize(query)[:MAX_QUERY_TERMS]
+        if not terms:
+            return [], None
+        page_size = page_size or settings.FEED_PAGE_SIZE
+        candidates = {}
+        for term in terms:
+            postings = self.filter(term=term).order_by(
+                '-created', '-tweet').values_list('tweet', 'created')[
+                :settings.SEARCH_MAX_CANDIDATES]
+            for tweet_id, created in postings:
+                rank = candidates.get(tweet_id, (0,))[0]
+                candidates[tweet_id] = (rank + 1, created)
+        ranked = sorted(
+            ((rank, created, tweet_id)
+             for tweet_id, (rank, created) in candidates.items()),
+            reverse=True)
+        position = decode_search_cursor(cursor)
+        if position is not None:
+            ranked = [row for row in ranked if row < position]
+
+        rows = ranked[:page_size + 1]
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_search_cursor(*rows[-1])
+        tweets = Tweet.objects.select_related('user').in_bulk(
+            [tweet_id for _, _, tweet_id in rows])
+        return [tweets[tweet_id] for _, _, tweet_id in rows
+                if tweet_id in tweets], next_cursor
+
+
+class Posting(models.Model):
+    """One term of one tweet. `created` is copied from the tweet so
+    results can be ordered without joining it."""
+    class Meta:
+        unique_together = ('term', 'tweet')
+        index_together = [('term', 'created', 'tweet')]
+
+    term = models.CharField(max_length=MAX_TERM_LENGTH)
+    tweet = models.ForeignKey(
+        Tweet, related_name='postings', on_delete=models.CASCADE)
+    created = models.DateTimeField()
+
+    objects = PostingManager()
+
+
+class HashtagManager(models.Manager):
+
+    def index(self, tweet, replace=False):
+        """Stores the hashtags of `tweet` and returns them."""
+        if replace:
+            self.filter(tweet=tweet).delete()
+        tags = extract_hashtags(tweet.content)
+        self.bulk_create([
+            Hashtag(tag=tag, tweet_id=tweet.pk, created=tweet.created)
+            for tag in tags])
+        return tags
+
+    def feed(self, tag, cursor=None, page_size=None):
+        """One page of the tweets tagged `tag`, newest first, as a
+        `(tweets, next_cursor)` tuple."""
+        entries, next_cursor = paginate(
+            self.filter(tag=tag.lower()).select_related('tweet__user'),
+            cursor, page_size, id_field='tweet')
+        return [entry.tweet for entry in entries], next_cursor
+
+
+class Hashtag(models.Model):
+    class Meta:
+        unique_together = ('tag', 'tweet')
+        index_together = [('tag', 'created', 'tweet')]
+
+    tag = models.CharField(max_length=MAX_TAG_LENGTH)
+    tweet = models.ForeignKey(
+        Tweet, related_name='hashtags', on_delete=models.CASCADE)
+    created = models.DateTimeField()
+
+    objects = HashtagManager()
+
+
+class MentionManager(models.Manager):
+
+    def index(self, tweet, replace=False):
+        """Stores who `tweet` mentions. Usernames are resolved with a
+        single query, however many mentions the tweet has."""
+        if replace:
+            self.filter(tweet=tweet).delete()
+        names = extract_mentions(tweet.content)
+        if not names:
+            return
+        user_ids = User.objects.filter(
+            username__in=names).values_list('pk', flat=True)
+        self.bulk_create([
+            Mention(user_id=user_id, tweet_id=tweet.pk, created=tweet.created)
+            for user_id in user_ids])
+
+
+class Mention(models.Model):
+    class Meta:
+        unique_together = ('user', 'tweet')
+        index_together = [('user', 'created', 'tweet')]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+')
+    tweet = models.ForeignKey(
+        Tweet, related_name='mentions', on_delete=models.CASCADE)
+    created = models.DateTimeField()
+
+    objects = MentionManager()
+
+
+class TimelineManager(models.Manager):
+
+    def fan_out(self, tweet):
+        """Pushes a freshly created tweet into its author's timeline and
+        into the timeline of everyone following the author."""
+        if tweet.user_id is None:
+            return
+        # a set: the author may be among their own followers
+        user_ids = set(Relationship.objects.filter(
+            following_id=tweet.user_id).values_list('follower_id', flat=True))
+        user_ids.add(tweet.user_id)
+        self.bulk_create(
+            [self.model(user_id=user_id, tweet=tweet, created=tweet.created)
+             for user_id in user_ids],
+            batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE)
+        publish(user_ids)
+
+    def backfill(self, user, *twitter_profiles):
+        """Copies the most recent tweets of each of `twitter_profiles` into
+        the timeline of `user` (used right after a follow)."""
+        entries = []
+        for twitter_profile in twitter_profiles:
+            tweets = Tweet.objects.filter(user=twitter_profile).exclude(
+                timeline_entries__user=user).values_list('id', 'created')
+            entries.extend(
+                self.model(user=user, tweet_id=tweet_id, created=created)
+                for tweet_id, created in tweets[:settings.TIMELINE_LENGTH])
+        self.bulk_create(
+            entries, batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE)
+
+    def prune(self, user, *twitter_profiles):
+        """Removes every tweet of `twitter_profiles` from the timeline of
+        `user` (used right after an unfollow)."""
+        pks = [twitter_profile.pk for twitter_profile in twitter_profiles
+               if twitter_profile.pk != user.pk]
+        for start in range(0, len(pks), LOOKUP_BATCH_SIZE):
+            self.filter(user=user, tweet__user__in=pks[
+                start:start + LOOKUP_BATCH_SIZE]).delete()
+
+    def rebuild(self, user):
+        """Recomputes the whole timeline of `user` from the accounts it
+        follows (used after bulk loads that bypass `fan_out`)."""
+        self.filter(user=user).delete()
+        following = Relationship.objects.filter(
+            follower=user).values('following_id')
+        tweets = Tweet.objects.filter(
+            Q(user=user) | Q(user__in=following)).values_list('id', 'created')
+        self.bulk_create(
+            [self.model(user=user, tweet_id=tweet_id, created=created)
+             for tweet_id, created in tweets[:settings.TIMELINE_LENGTH]],
+            batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE)
+
+    def for_user(self, user):
+        return self.filter(user=user).select_related('tweet__user')
+
+
+class TimelineEntry(models.Model):
+    """Precomputed home timeline row. Tweets are written here once per
+    reader when they are created, so rendering a home feed is a single
+    indexed range read instead of an OR query over everyone followed.
+    Entries go away together with their tweet (see `on_delete`)."""
+    class Meta:
+        ordering = ['-created', '-tweet']
+        unique_together = ('user', 'tweet')
+        index_together = [('user', 'created', 'tweet')]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+')
+    tweet = models.ForeignKey(Tweet, related_name='timeline_entries')
+    created = models.DateTimeField(null=True)
+
+    objects = TimelineManager()
+
+
 class User(AbstractUser):
 
-    avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar = ContentHashedImageField(
+        upload_to='avatars/', null=True, blank=True)
     birth_date = models.DateField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+    email_validated = models.BooleanField(default=False)
+    # Denormalized from Relationship, kept in sync by follow()/unfollow().
+    # Use the `repair_follow_counts` command to fix any drift.
+    following_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0, db_index=True)
+    # Set when this user follows or unfollows someone; the
+    # `compute_suggestions` command only revisits the neighborhood of
+    # flagged users.
+    suggestions_stale = models.BooleanField(default=True, db_index=True)
+    # Bumped whenever this user's group membership changes, so every
+    # process sees that its cached roles are stale (see twitter.roles).
+    roles_version = models.PositiveIntegerField(default=0)
 
     def follow(self, twitter_profile):
+        if twitter_profile.pk == self.pk:
+            return
         try:
-            Relationship.objects.get(follower=self, following=twitter_profile)
-        except Relationship.DoesNotExist:
-            Relationship.objects.create(
-                follower=self, following=twitter_profile)
+            with transaction.atomic():
+                Relationship.objects.create(
+                    follower=self, following=twitter_profile)
+                self._update_follow_counts([twitter_profile.pk], 1)
+        except IntegrityError:
+            return
+        self.following_count += 1
+        twitter_profile.followers_count += 1
+        TimelineEntry.objects.backfill(self, twitter_profile)
+        DailyStats.objects.record_follows(self, 1)
 
     def unfollow(self, twitter_profile):
+        with transaction.atomic():
+            deleted, _ = Relationship.objects.filter(
+                follower=self, following=twitter_profile).delete()
+            if not deleted:
+                return
+            self._update_follow_counts([twitter_profile.pk], -1)
+        self.following_count = max(self.following_count - 1, 0)
+        twitter_profile.followers_count = max(
+            twitter_profile.followers_count - 1, 0)
+        TimelineEntry.objects.prune(self, twitter_profile)
+        DailyStats.objects.record_unfollows(self, 1)
+
+    def follow_many(self, twitter_profiles):
+        """Follows every user in `twitter_profiles` with a single batched
+        insert, skipping this user. Returns the number of users that were
+        newly followed."""
+        twitter_profiles = dict(
+            (twitter_profile.pk, twitter_profile)
+            for twitter_profile in twitter_profiles
+            if twitter_profile.pk != self.pk)
+        pks = list(twitter_profiles)
+        for start in range(0, len(pks), LOOKUP_BATCH_SIZE):
+            already_following = Relationship.objects.filter(
+                follower=self,
+                following__in=pks[start:start + LOOKUP_BATCH_SIZE],
+            ).values_list('following_id', flat=True)
+            for pk in already_following:
+                del twitter_profiles[pk]
+        if not twitter_profiles:
+            return 0
         try:
-            rel = Relationship.objects.get(
-                follower=self, following=twitter_profile)
-        except Relationship.DoesNotExist:
-            return
-        rel.delete()
+            with transaction.atomic():
+                Relationship.objects.bulk_create(
+                    [Relationship(follower=self, following_id=pk)
+                     for pk in twitter_profiles],
+                    batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE)
+                self._update_follow_counts(list(twitter_profiles), 1)
+        except IntegrityError:
+            # Lost a race against a concurrent follow; fall back to the
+            # per-user path, which skips the rows that already exist.
+            following_count = self.following_count
+            for twitter_profile in twitter_profiles.values():
+                self.follow(twitter_profile)
+            return self.following_count - following_count
+        self.following_count += len(twitter_profiles)
+        TimelineEntry.objects.backfill(self, *twitter_profiles.values())
+        DailyStats.objects.record_follows(self, len(twitter_profiles))
+        return len(twitter_profiles)
+
+    def unfollow_many(self, twitter_profiles):
+        """Unfollows every user in `twitter_profiles` with a single batched
+        delete. Returns the number of users that were unfollowed."""
+        twitter_profiles = list(twitter_profiles)
+        profile_pks = [twitter_profile.pk
+                       for twitter_profile in twitter_profiles]
+        with transaction.atomic():
+            pks = []
+            for start in range(0, len(profile_pks), LOOKUP_BATCH_SIZE):
+                chunk = profile_pks[start:start + LOOKUP_BATCH_SIZE]
+                pks.extend(Relationship.objects.select_for_update().filter(
+                    follower=self, following__in=chunk,
+                ).values_list('following_id', flat=True))
+            if not pks:
+                return 0
+            for start in range(0, len(pks), LOOKUP_BATCH_SIZE):
+                Relationship.objects.filter(
+                    follower=self,
+                    following__in=pks[start:start + LOOKUP_BATCH_SIZE],
+                ).delete()
+            self._update_follow_counts(pks, -1)
+        self.following_count = max(self.following_count - len(pks), 0)
+        unfollowed = set(pks)
+        TimelineEntry.objects.prune(
+            self, *[twitter_profile for twitter_profile in twitter_profiles
+                    if twitter_profile.pk in unfollowed])
+        DailyStats.objects.record_unfollows(self, len(pks))
+        return len(pks)
+
+    def _update_follow_counts(self, pks, delta):
+        following = User.objects.filter(pk=self.pk)
+        if delta < 0:
+            following = following.filter(
+                following_count__gte=-delta * len(pks))
+        following.update(
+            following_count=F('following_count') + delta * len(pks),
+            suggestions_stale=True)
+        for start in range(0, len(pks), LOOKUP_BATCH_SIZE):
+            followers = User.objects.filter(
+                pk__in=pks[start:start + LOOKUP_BATCH_SIZE])
+            if delta < 0:
+                followers = followers.filter(followers_count__gte=-delta)
+            followers.update(followers_count=F('followers_count') + delta)
+
+    def who_to_follow(self, limit=None):
+        """The precomputed follow suggestions of this user, best first,
+        leaving out the accounts followed since they were computed."""
+        return [
+            suggestion.suggested for suggestion in
+            Suggestion.objects.filter(user=self).exclude(
+                suggested__in=Relationship.objects.filter(
+                    follower=self).values('following_id'))
+            .select_related('suggested')
+            [:limit or settings.SUGGESTIONS_SHOWN]]
 
     def is_following(self, twitter_profile):
         return Relationship.objects.filter(
@@ -43,18 +460,378 @@ class User(AbstractUser):
 
     @property
     def following(self):
-        return [rel.following for rel in
-                Relationship.objects.filter(follower=self)]
+        """Lazy queryset of the users this user follows."""
+        return User.objects.filter(pk__in=Relationship.objects.filter(
+            follower=self).values('following_id'))
 
     @property
     def followers(self):
-        return [rel.following for rel in
-                Relationship.objects.filter(following=self)]
+        """Lazy queryset of the users following this user."""
+        return User.objects.filter(pk__in=Relationship.objects.filter(
+            following=self).values('follower_id'))
+
+    @property
+    def cache_version(self):
+        return int(calendar.timegm(self.updated.utctimetuple()) * 10 ** 6 +
+                   self.updated.microsecond)
 
     @property
     def count_following(self):
-        return Relationship.objects.filter(follower=self).count()
+        return self.following_count
 
     @property
     def count_followers(self):
-        return Relationship.objects.filter(following=self).count()
+        return self.followers_count
+
+    def timeline(self, cursor=None, page_size=None):
+        """One page of this user's home feed, newest first, as a
+        `(tweets, next_cursor)` tuple."""
+        entries, next_cursor = paginate(
+            TimelineEntry.objects.for_user(self), cursor, page_size,
+            id_field='tweet')
+        return [entry.tweet for entry in entries], next_cursor
+
+    def timeline_since(self, cursor=None, limit=None):
+        """The tweets added to this user's home feed after `cursor`, newest
+        first, as a `(tweets, cursor)` tuple (see `newer_than`)."""
+        entries, cursor = newer_than(
+            TimelineEntry.objects.for_user(self), cursor,
+            limit or settings.LIVE_UPDATES_LIMIT, id_field='tweet')
+        return [entry.tweet for entry in entries], cursor
+
+    def mentions_page(self, cursor=None, page_size=None):
+        """One page of the tweets mentioning this user, newest first, as a
+        `(tweets, next_cursor)` tuple."""
+        entries, next_cursor = paginate(
+            Mention.objects.filter(user=self).select_related('tweet__user'),
+            cursor, page_size, id_field='tweet')
+        return [entry.tweet for entry in entries], next_cursor
+
+    def tweets_page(self, cursor=None, page_size=None):
+        """One page of the tweets authored by this user, newest first, as
+        a `(tweets, next_cursor)` tuple. Pages that reach past the archive
+        horizon are merged with the user's archived tweets."""
+        page_size = page_size or settings.FEED_PAGE_SIZE
+        tweets = list(after_cursor(
+            Tweet.objects.filter(user=self).select_related('user'),
+            cursor)[:page_size + 1])
+        if len(tweets) <= page_size or \
+                tweets[-1].created < ArchivedTweet.objects.horizon():
+            tweets.extend(after_cursor(
+                ArchivedTweet.objects.filter(user=self).select_related('user'),
+                cursor)[:page_size + 1])
+            tweets.sort(key=lambda tweet: (tweet.created, tweet.pk),
+                        reverse=True)
+        return cut_page(tweets, page_size)
+
+
+class Suggestion(models.Model):
+    """An account `user` may want to follow, precomputed by the
+    `compute_suggestions` command. `score` is the number of accounts
+    followed by `user` that follow `suggested`."""
+    class Meta:
+        ordering = ['-score', 'suggested']
+        unique_together = ('user', 'suggested')
+        index_together = [('user', 'score')]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='suggestions')
+    suggested = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+')
+    score = models.PositiveIntegerField()
+
+
+class ImportCheckpoint(models.Model):
+    """How many records of a dump file `import_data` has loaded. It is
+    written in the transaction that loads them, so it never counts a
+    batch that was rolled back, nor misses one that was committed."""
+    path = models.CharField(max_length=255, unique=True)
+    done = models.PositiveIntegerField(default=0)
+
+
+def default_token_expiry():
+    return timezone.now() + timedelta(seconds=settings.VALIDATION_TOKEN_TTL)
+
+
+class ValidationTokenManager(models.Manager):
+
+    def issue(self, email, purpose='', user=None):
+        """Creates a new random token of `purpose` for `user`, sent to
+        `email`. Only the newest VALIDATION_TOKENS_PER_EMAIL tokens of an
+        address are kept; older ones are replaced."""
+        token = self.create(email=email, purpose=purpose, user=user,
+                            token=get_random_string(32))
+        stale = list(self.filter(email=email).order_by(
+            '-created', '-pk').values_list('pk', flat=True)[
+            settings.VALIDATION_TOKENS_PER_EMAIL:])
+        if stale:
+            self.filter(pk__in=stale).delete()
+        return token
+
+    def valid(self, purpose):
+        """Unexpired tokens of `purpose`, and the ones issued before tokens
+        had a purpose (those have none and name only an email)."""
+        return self.filter(Q(purpose=purpose) | Q(purpose=''),
+                           expires__gt=timezone.now())
+
+    def expired(self):
+        return self.filter(expires__lte=timezone.now())
+
+
+class ValidationToken(models.Model):
+    """One-time token sent by email to validate an account or to reset its
+    password. A token only works for the `purpose` it was issued for and
+    only acts on its `user`. Tokens expire after VALIDATION_TOKEN_TTL
+    seconds and are looked up by their unique `token`;
+    `purge_validation_tokens` deletes the expired ones."""
+    VALIDATE_EMAIL = 'validate'
+    RESET_PASSWORD = 'reset'
+    PURPOSE_CHOICES = (
+        (VALIDATE_EMAIL, 'Validate email'),
+        (RESET_PASSWORD, 'Reset password'),
+    )
+
+    email = models.EmailField(db_index=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, related_name='+')
+    purpose = models.CharField(
+        max_length=10, choices=PURPOSE_CHOICES, blank=True, default='')
+    token = models.CharField(max_length=64, unique=True)
+    created = models.DateTimeField(default=timezone.now)
+    expires = models.DateTimeField(default=default_token_expiry, db_index=True)
+
+    objects = ValidationTokenManager()
+
+    def get_user(self):
+        """The user the token acts on. Tokens without one (issued before
+        tokens named their user) act on the oldest account of `email`."""
+        if self.user_id is not None:
+            return self.user
+        return User.objects.filter(email=self.email).order_by('pk').first()
+
+
+class OutgoingEmailManager(models.Manager):
+
+    def enqueue(self, subject, body, to, from_email=None):
+        """Queues an email for the `send_queued_mail` worker. `to` is a list
+        of addresses."""
+        return self.create(
+            subject=subject, body=body, to=','.join(to),
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL)
+
+    def due(self):
+        """Queued emails whose next attempt is due and that no worker
+        holds; claims older than EMAIL_QUEUE_CLAIM_TIMEOUT are taken to
+        belong to a dead worker."""
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.EMAIL_QUEUE_CLAIM_TIMEOUT)
+        return self.filter(
+            models.Q(claimed_at__isnull=True) | models.Q(claimed_at__lt=stale),
+            status=OutgoingEmail.QUEUED, next_attempt__lte=now,
+        ).order_by('next_attempt', 'pk')
+
+    def claim(self, worker, limit):
+        """Claims up to `limit` due emails for `worker` and returns them.
+        The claim is a single UPDATE that only matches rows still
+        unclaimed, so concurrent workers never get the same email."""
+        claim_id = '{}:{}'.format(worker, get_random_string(8))
+        pks = list(self.due().values_list('pk', flat=True)[:limit])
+        if not pks:
+            return []
+        self.due().filter(pk__in=pks).update(
+            claimed_at=timezone.now(), claimed_by=claim_id)
+        return list(self.filter(claimed_by=claim_id).order_by(
+            'next_attempt', 'pk'))
+
+
+class OutgoingEmail(models.Model):
+    """Email waiting to be sent by the `send_queued_mail` worker, so that
+    views never wait on SMTP. Workers claim emails before sending them
+    (`claimed_at`/`claimed_by`) and release them once sent or failed.
+    Failed sends are retried with exponential backoff and end up as FAILED
+    after EMAIL_QUEUE_MAX_ATTEMPTS."""
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    class Meta:
+        index_together = [('status', 'next_attempt')]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.TextField()
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(default=timezone.now)
+    sent = models.DateTimeField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=100, blank=True)
+
+    objects = OutgoingEmailManager()
+
+    def as_message(self, connection=None):
+        return EmailMessage(
+            self.subject, self.body, self.from_email, self.to.split(','),
+            connection=connection)
+
+    def mark_sent(self):
+        self.status = self.SENT
+        self.sent = timezone.now()
+        self.attempts += 1
+        self.claimed_at, self.claimed_by = None, ''
+        self.save(update_fields=[
+            'status', 'sent', 'attempts', 'claimed_at', 'claimed_by'])
+
+    def mark_failed(self, error):
+        """Schedules a retry, or gives up after EMAIL_QUEUE_MAX_ATTEMPTS."""
+        self.attempts += 1
+        self.last_error = error
+        if self.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+            self.status = self.FAILED
+        else:
+            self.next_attempt = timezone.now() + timedelta(
+                seconds=settings.EMAIL_QUEUE_RETRY_DELAY *
+                2 ** (self.attempts - 1))
+        self.claimed_at, self.claimed_by = None, ''
+        self.save(update_fields=[
+            'attempts', 'last_error', 'status', 'next_attempt', 'claimed_at',
+            'claimed_by'])
+
+
+def stats_day(when):
+    return timezone.localtime(when).date()
+
+
+def stats_hour(when):
+    return when.astimezone(timezone.utc).replace(
+        minute=0, second=0, microsecond=0)
+
+
+class StatsManager(models.Manager):
+
+    def increment(self, key, **deltas):
+        """Adds `deltas` to the counters of the row matching `key`, creating
+        the row on first use."""
+        updates = dict((field, F(field) + delta)
+                       for field, delta in deltas.items())
+        if self.filter(**key).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                self.create(**dict(key, **deltas))
+        except IntegrityError:
+            # created concurrently in between
+            self.filter(**key).update(**updates)
+
+
+class DailyStatsManager(StatsManager):
+
+    def record_signup(self, user):
+        self.increment({'date': stats_day(user.date_joined)}, signups=1)
+
+    def record_tweet(self, tweet):
+        self.increment({'date': stats_day(tweet.created)}, tweets=1)
+        HourlyTweetCount.objects.increment(
+            {'hour': stats_hour(tweet.created)}, tweets=1)
+        self.record_activity(tweet.user_id, tweet.created)
+
+    def record_follows(self, user, count):
+        now = timezone.now()
+        self.increment({'date': stats_day(now)}, follows=count)
+        self.record_activity(user.pk, now)
+
+    def record_unfollows(self, user, count):
+        now = timezone.now()
+        self.increment({'date': stats_day(now)}, unfollows=count)
+        self.record_activity(user.pk, now)
+
+    def record_activity(self, user_id, when):
+        """Counts `user_id` as active on the day of `when`, once."""
+        if user_id is None:
+            return
+        day = stats_day(when)
+        try:
+            with transaction.atomic():
+                DailyActiveUser.objects.create(date=day, user_id=user_id)
+        except IntegrityError:
+            return
+        self.increment({'date': day}, active_users=1)
+
+
+class DailyStats(models.Model):
+    """Per-day counters for the admin dashboard, incremented as things
+    happen (and re-synced by the `rebuild_stats` command) so the dashboard
+    never aggregates over Tweet or Relationship."""
+    class Meta:
+        ordering = ['-date']
+
+    date = models.DateField(unique=True)
+    signups = models.PositiveIntegerField(default=0)
+    tweets = models.PositiveIntegerField(default=0)
+    follows = models.PositiveIntegerField(default=0)
+    unfollows = models.PositiveIntegerField(default=0)
+    active_users = models.PositiveIntegerField(default=0)
+
+    objects = DailyStatsManager()
+
+
+class HourlyTweetCount(models.Model):
+    class Meta:
+        ordering = ['-hour']
+
+    hour = models.DateTimeField(unique=True)
+    tweets = models.PositiveIntegerField(default=0)
+
+    objects = StatsManager()
+
+
+class DailyActiveUser(models.Model):
+    """Users seen on a given day, used to count each of them only once in
+    DailyStats.active_users. Old rows are purged by `rebuild_stats`."""
+    class Meta:
+        unique_together = ('date', 'user')
+
+    date = models.DateField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+')
+
+
+class HashtagCountManager(StatsManager):
+
+    def record(self, tags, when):
+        hour = stats_hour(when)
+        for tag in tags:
+            self.increment({'tag': tag, 'hour': hour}, tweets=1)
+
+    def trending(self, hours=None, limit=None):
+        """Returns `(tag, tweets)` tuples for the most used hashtags of the
+        last `hours` hours, read from the hourly counters only."""
+        hours = hours or settings.TRENDING_TAGS_HOURS
+        since = stats_hour(timezone.now()) - timedelta(hours=hours - 1)
+        return list(
+            self.filter(hour__gte=since).values_list('tag')
+            .annotate(total=Sum('tweets'))
+            .order_by('-total', 'tag')[:limit or settings.TRENDING_TAGS_LIMIT])
+
+
+class HashtagCount(models.Model):
+    """Number of tweets using a hashtag per hour, incremented when tweets
+    are created (deleting a tweet does not decrement it until
+    `rebuild_stats` re-syncs the hour from `Hashtag`). Rows older than the
+    `rebuild_stats` window are purged by that command."""
+    class Meta:
+        unique_together = ('tag', 'hour')
+        index_together = [('hour', 'tag')]
+
+    tag = models.CharField(max_length=MAX_TAG_LENGTH)
+    hour = models.DateTimeField()
+    tweets = models.PositiveIntegerField(default=0)
+
+    objects = HashtagCountManager()
@@ -0,0 +1,94 @@
+"""Full-page cache for profile pages seen by anonymous visitors.
+
+Pages are cached under the username and a per-user version, which
+`bump_version` replaces whenever the page content changes (see
+`twitter.signals`), so stale pages are never looked up again and simply
+expire.
+
+On a miss, only the request that gets the rebuild lock renders the page.
+Concurrent requests for the same page are served the previous version of
+it while there is one, or wait up to PROFILE_PAGE_WAIT seconds for the
+rebuild, so a popular profile changing does not send every visitor to
+the database at once.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.crypto import get_random_string
+
+POLL_INTERVAL = 0.05
+
+
+def version_key(username):
+    return 'profile-version:{}'.format(username)
+
+
+def new_version():
+    return '{:x}{}'.format(int(time.time() * 10 ** 6), get_random_string(4))
+
+
+def get_version(username):
+    key = version_key(username)
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(username):
+    cache.set(version_key(username), new_version(), None)
+
+
+def cached_page(request, username, render):
+    """Returns the anonymous profile page of `username` for `request`,
+    calling `render()` to build it when it is not cached."""
+    query = hashlib.md5(request.GET.urlencode().encode('utf-8')).hexdigest()
+    key = 'profile-page:{}:{}:{}'.format(
+        username, get_version(username), query)
+    stale_key = 'profile-page-stale:{}:{}'.format(username, query)
+
+    page = cache.get(key)
+    if page is None:
+        lock = key + ':lock'
+        if cache.add(lock, 1, settings.PROFILE_PAGE_LOCK_TIMEOUT):
+            try:
+                return _render(render, key, stale_key)
+            finally:
+                cache.delete(lock)
+        page = cache.get(stale_key) or _wait(key)
+        if page is None:
+            return _render(render, key, stale_key)
+    return _cacheable(HttpResponse(page[0], content_type=page[1]))
+
+
+def _render(render, key, stale_key):
+    response = render()
+    if response.status_code == 200:
+        page = (response.content, response['Content-Type'])
+        cache.set(key, page, settings.PROFILE_PAGE_CACHE_TIMEOUT)
+        cache.set(stale_key, page, settings.PROFILE_PAGE_CACHE_TIMEOUT)
+    return _cacheable(response)
+
+
+def _wait(key):
+    deadline = time.time() + settings.PROFILE_PAGE_WAIT
+    while time.time() < deadline:
+        time.sleep(POLL_INTERVAL)
+        page = cache.get(key)
+        if page is not None:
+            return page
+    return None
+
+
+def _cacheable(response):
+    patch_vary_headers(response, ['Cookie'])
+    if response.status_code == 200:
+        patch_cache_control(response, public=True,
+                            max_age=settings.PROFILE_PAGE_MAX_AGE)
+    return response
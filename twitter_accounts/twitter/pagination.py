@@ -0,0 +1,85 @@
+"""Keyset (cursor) pagination over `(created, id)`.
+
+Pages are fetched with a range condition on the composite index instead of
+an OFFSET, so loading the 1000th page costs the same as loading the first.
+A cursor is the `created` timestamp (in microseconds since the epoch) and
+the id of the last row of the previous page, joined by an underscore.
+The same cursors are used to ask for rows newer than one already shown.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(created, pk):
+    delta = created - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+    return '{}_{}'.format(micros, pk)
+
+
+def decode_cursor(cursor):
+    """Returns a `(created, pk)` tuple, or None if `cursor` is empty or
+    malformed (callers then start from the newest row)."""
+    try:
+        micros, pk = cursor.split('_')
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def after_cursor(queryset, cursor=None, id_field='id'):
+    """Orders `queryset` newest first and, given a valid `cursor`, keeps
+    only the rows that come after it."""
+    queryset = queryset.order_by('-created', '-' + id_field)
+    position = decode_cursor(cursor)
+    if position is not None:
+        created, pk = position
+        queryset = queryset.filter(
+            Q(created__lte=created),
+            Q(created__lt=created) | Q(**{id_field + '__lt': pk}))
+    return queryset
+
+
+def paginate(queryset, cursor=None, page_size=None, id_field='id'):
+    """Returns `(items, next_cursor)` for the page that follows `cursor`,
+    newest first. `next_cursor` is None on the last page."""
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    queryset = after_cursor(queryset, cursor, id_field)
+    return cut_page(list(queryset[:page_size + 1]), page_size,
+                    queryset.model._meta.get_field(id_field).attname)
+
+
+def cut_page(items, page_size, attname='id'):
+    """Returns `(items, next_cursor)` from up to `page_size + 1` rows,
+    the extra one only telling that there is a next page."""
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    last = items[-1]
+    return items, encode_cursor(last.created, getattr(last, attname))
+
+
+def newer_than(queryset, cursor=None, limit=None, id_field='id'):
+    """Returns `(items, cursor)` with up to `limit` rows that are newer than
+    `cursor`, newest first, and the cursor of the newest one (`cursor`
+    itself when there is nothing new). Without a valid cursor the newest
+    rows are returned."""
+    limit = limit or settings.FEED_PAGE_SIZE
+    position = decode_cursor(cursor)
+    if position is None:
+        items = list(queryset.order_by('-created', '-' + id_field)[:limit])
+    else:
+        created, pk = position
+        items = list(queryset.filter(
+            Q(created__gte=created),
+            Q(created__gt=created) | Q(**{id_field + '__gt': pk})
+        ).order_by('created', id_field)[:limit])
+        items.reverse()
+    if not items:
+        return items, cursor
+    attname = queryset.model._meta.get_field(id_field).attname
+    return items, encode_cursor(items[0].created, getattr(items[0], attname))
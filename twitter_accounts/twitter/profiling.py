@@ -0,0 +1,176 @@
+"""On-demand profiling for admin users.
+
+`ProfilingMiddleware` runs a single request under a profiler when an admin
+user (see `twitter.roles`) asks for it with `?profile=<format>` or the
+`X-Profile: <format>` header, and returns the profile as a download
+instead of the page:
+
+* `pstats`: a cProfile dump, readable with `pstats.Stats` or snakeviz.
+* `collapsed`: the request's stacks sampled every PROFILING_INTERVAL
+  seconds, in the collapsed format of flamegraph.pl and speedscope.
+
+`/profiling` runs a background sampler over every request served by this
+process: a POST starts it for a window of `seconds`, and a GET downloads
+the collapsed stacks it has aggregated so far, so no request waits for
+the window to end. Sampling reads the stacks of the request threads from
+the sampler's own thread, so requests pay nothing but registering their
+thread. Views decorated with `not_sampled` (the long poll and the
+profiling view itself) are left out, as their stacks would only show them
+waiting. Each process samples its own requests.
+"""
+import cProfile
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from . import roles
+
+FORMATS = ('pstats', 'collapsed')
+
+# Threads currently serving a request.
+_active = set()
+_active_lock = threading.Lock()
+
+# The background sampler of this process, if one was started.
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def collapse(frame):
+    """The stack of `frame` as `module.function` names joined by `;`,
+    outermost call first."""
+    names = []
+    while frame is not None:
+        names.append('{}.{}'.format(
+            frame.f_globals.get('__name__', '?'), frame.f_code.co_name))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def not_sampled(view_func):
+    """Leaves requests to the decorated view out of background sampling."""
+    view_func.not_sampled = True
+    return view_func
+
+
+class Sampler(threading.Thread):
+    """Counts the stacks of `thread_ids` (by default the threads serving
+    requests) every `interval` seconds until stopped, or until `seconds`
+    have passed if given."""
+
+    def __init__(self, interval, thread_ids=None, seconds=None):
+        super(Sampler, self).__init__()
+        self.daemon = True
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.seconds = seconds
+        self.counts = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        deadline = None if self.seconds is None else \
+            time.time() + self.seconds
+        while not self._done.wait(self.interval):
+            if deadline is not None and time.time() >= deadline:
+                break
+            self.sample()
+
+    def sample(self):
+        if self.thread_ids is None:
+            with _active_lock:
+                thread_ids = list(_active)
+        else:
+            thread_ids = self.thread_ids
+        frames = sys._current_frames()
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                stack = collapse(frame)
+                # counts may be read by a request while this thread runs
+                with _sampler_lock:
+                    self.counts[stack] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def collapsed(self):
+        with _sampler_lock:
+            counts = sorted(self.counts.items())
+        return ''.join('{} {}\n'.format(stack, count)
+                       for stack, count in counts)
+
+
+def start_sampling(seconds):
+    """Starts sampling the requests of this process for `seconds` in the
+    background, replacing the previous sampler and its results."""
+    global _sampler
+    sampler = Sampler(settings.PROFILING_INTERVAL, seconds=seconds)
+    with _sampler_lock:
+        previous, _sampler = _sampler, sampler
+    if previous is not None:
+        previous.stop()
+    sampler.start()
+    return sampler
+
+
+def current_sampler():
+    """The last sampler started in this process, running or finished."""
+    return _sampler
+
+
+def download(content, content_type, name):
+    response = HttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(name)
+    return response
+
+
+class ProfilingMiddleware(object):
+    """Must come last, so the other middleware have processed the view
+    before it is run here."""
+
+    def process_request(self, request):
+        with _active_lock:
+            _active.add(threading.current_thread().ident)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'not_sampled', False):
+            with _active_lock:
+                _active.discard(threading.current_thread().ident)
+        profile_format = request.GET.get(
+            'profile', request.META.get('HTTP_X_PROFILE'))
+        if profile_format not in FORMATS or not roles.is_admin(request.user):
+            return None
+
+        if profile_format == 'pstats':
+            profiler = cProfile.Profile()
+            response = profiler.runcall(
+                view_func, request, *view_args, **view_kwargs)
+            profiler.create_stats()
+            content = marshal.dumps(profiler.stats)
+            content_type = 'application/octet-stream'
+        else:
+            sampler = Sampler(settings.PROFILING_INTERVAL,
+                              [threading.current_thread().ident])
+            sampler.start()
+            try:
+                response = view_func(request, *view_args, **view_kwargs)
+            finally:
+                sampler.stop()
+            content = sampler.collapsed()
+            content_type = 'text/plain'
+
+        profiled = download(content, content_type, '{}-{}.{}'.format(
+            view_func.__name__, int(time.time()), profile_format))
+        profiled['X-Profiled-Status'] = str(response.status_code)
+        return profiled
+
+    def process_response(self, request, response):
+        with _active_lock:
+            _active.discard(threading.current_thread().ident)
+        return response
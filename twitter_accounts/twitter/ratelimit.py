@@ -0,0 +1,117 @@
+"""Rate limiting of writes and logins.
+
+Every scope in RATELIMITS gets a bucket of tokens per user (`'user'`, by
+IP for anonymous requests) or per IP (`'ip'`), written as `'<count>/<s,
+m, h or d>'`: `'30/m'` is 30 tokens, all refilled at the start of every
+minute. A bucket is an atomic counter in the cache of the tokens taken in
+the current period, so checking a request costs one `incr` (plus an
+`add` for the first request of a period) and needs nothing but the cache.
+Refilling once per period lets a client spend up to twice the rate across
+a period boundary, which is fine for stopping abuse.
+
+Buckets live in the RATELIMIT_CACHE cache alias. It has to be shared by
+every process serving the site (memcached, redis), otherwise each process
+keeps buckets of its own and clients get the rate once per process;
+`manage.py check --deploy` warns about a local-memory one.
+
+Anonymous clients are told apart by IP. Behind proxies, REMOTE_ADDR is
+the proxy's: set RATELIMIT_PROXY_COUNT to the number of proxies in front
+of the site to take the client address from X-Forwarded-For, or
+RATELIMIT_IP_META_KEY to the header a single proxy sets (e.g.
+'HTTP_X_REAL_IP'). Never trust those headers without a proxy that
+overwrites them.
+
+Views are limited with the `ratelimit` decorator, or, for views of other
+apps, by listing them in RATELIMITED_VIEWS for `RateLimitMiddleware`.
+Requests over the limit get a 429 with a Retry-After header.
+"""
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def client_ip(request):
+    """The client's address, as seen by the outermost trusted proxy."""
+    proxies = settings.RATELIMIT_PROXY_COUNT
+    if proxies:
+        forwarded = [ip.strip() for ip in request.META.get(
+            'HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get(settings.RATELIMIT_IP_META_KEY, '')
+
+
+def bucket_id(request, key):
+    if key == 'user' and request.user.is_authenticated():
+        return 'user-{}'.format(request.user.pk)
+    return 'ip-{}'.format(client_ip(request))
+
+
+def take_token(scope, bucket, rate):
+    """Takes a token from `bucket` of `scope`. Returns 0 when there was
+    one left, otherwise the seconds until the bucket is refilled."""
+    count, period = parse_rate(rate)
+    cache = caches[settings.RATELIMIT_CACHE]
+    now = int(time.time())
+    key = 'ratelimit:{}:{}:{}'.format(scope, bucket, now // period)
+    try:
+        taken = cache.incr(key)
+    except ValueError:
+        # First request of the period; a concurrent one may win the add.
+        taken = 1 if cache.add(key, 1, period + 1) else cache.incr(key)
+    if taken <= count:
+        return 0
+    return period - now % period
+
+
+def check(request, scope):
+    """Returns a 429 response if `request` is over the limit of `scope`."""
+    if scope not in settings.RATELIMITS:
+        return None
+    key, rate = settings.RATELIMITS[scope]
+    retry_after = take_token(scope, bucket_id(request, key), rate)
+    if not retry_after:
+        return None
+    response = HttpResponse('Too many requests, please try again later.',
+                            content_type='text/plain', status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Limits requests to the decorated view with the `methods` to the
+    rate of `scope` in RATELIMITS."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                limited = check(request, scope)
+                if limited is not None:
+                    return limited
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RateLimitMiddleware(object):
+    """Limits POSTs to the views in RATELIMITED_VIEWS (dotted path ->
+    scope). Must come after AuthenticationMiddleware."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method != 'POST':
+            return None
+        scope = settings.RATELIMITED_VIEWS.get(
+            '{}.{}'.format(view_func.__module__, view_func.__name__))
+        if scope is None:
+            return None
+        return check(request, scope)
@@ -0,0 +1,72 @@
+"""Friends-of-friends follow suggestions.
+
+An account is suggested to a user when people the user follows follow it;
+its score is how many of them do. The follow graph is read straight from
+the Relationship table as `(follower_id, following_id)` pairs and kept as
+one `array` of integer ids per user, which is a fraction of the memory of
+model instances and lets millions of edges fit in a batch job.
+"""
+import heapq
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import Relationship, Suggestion
+
+
+class FollowGraph(object):
+    """Following lists, loaded on demand for the users that need them."""
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.following = {}
+
+    def _read(self, queryset):
+        edges = defaultdict(lambda: array('l'))
+        for follower_id, following_id in queryset.values_list(
+                'follower_id', 'following_id').order_by().iterator():
+            edges[follower_id].append(following_id)
+        self.following.update(edges)
+
+    def load_all(self):
+        """Reads every edge in a single streaming pass."""
+        self._read(Relationship.objects.all())
+
+    def load(self, pks):
+        """Reads the following lists of the `pks` not loaded yet."""
+        missing = [pk for pk in set(pks) if pk not in self.following]
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            self._read(Relationship.objects.filter(follower_id__in=chunk))
+            for pk in chunk:
+                self.following.setdefault(pk, array('l'))
+
+    def suggestions(self, pk, limit):
+        """Returns up to `limit` `(score, suggested_pk)` pairs for `pk`,
+        best first. The following lists of `pk` and of everyone it follows
+        must be loaded."""
+        following = self.following.get(pk, ())
+        excluded = set(following)
+        excluded.add(pk)
+        scores = defaultdict(int)
+        for friend in following:
+            for candidate in self.following.get(friend, ()):
+                if candidate not in excluded:
+                    scores[candidate] += 1
+        return heapq.nsmallest(
+            limit, ((-score, candidate) for candidate, score in scores.items()))
+
+
+def store_suggestions(graph, pks, limit=None):
+    """Replaces the stored suggestions of every user in `pks`."""
+    limit = limit or settings.SUGGESTIONS_PER_USER
+    graph.load(pks)
+    graph.load(friend for pk in pks for friend in graph.following[pk])
+    rows = [
+        Suggestion(user_id=pk, suggested_id=candidate, score=-score)
+        for pk in pks
+        for score, candidate in graph.suggestions(pk, limit)]
+    Suggestion.objects.filter(user_id__in=pks).delete()
+    Suggestion.objects.bulk_create(rows)
+    return len(rows)
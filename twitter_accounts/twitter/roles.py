@@ -0,0 +1,58 @@
+"""Cached group membership.
+
+Group names are looked up once per user and kept in the cache, so
+templates and permission checks can ask about roles without hitting the
+database. Cached names are stored with the user's `roles_version`, which
+is bumped in the database whenever their membership (or one of their
+groups) changes. `request.user` is loaded on every request, so a stale
+entry is noticed by every process at once, even with a per-process cache.
+The invalidation receivers live in `twitter.signals`.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models import F
+
+from .db import LOOKUP_BATCH_SIZE
+
+
+def cache_key(user_pk):
+    return 'roles:{}'.format(user_pk)
+
+
+def get_group_names(user):
+    if not user.is_authenticated():
+        return frozenset()
+    key = cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == user.roles_version:
+        return cached[1]
+    names = frozenset(user.groups.values_list('name', flat=True))
+    cache.set(key, (user.roles_version, names), settings.ROLES_CACHE_TIMEOUT)
+    return names
+
+
+def invalidate(*user_pks):
+    user_pks = list(user_pks)
+    cache.delete_many([cache_key(pk) for pk in user_pks])
+    for start in range(0, len(user_pks), LOOKUP_BATCH_SIZE):
+        get_user_model().objects.filter(
+            pk__in=user_pks[start:start + LOOKUP_BATCH_SIZE]
+        ).update(roles_version=F('roles_version') + 1)
+
+
+def is_admin(user):
+    return settings.ADMIN_GROUP_NAME in get_group_names(user)
+
+
+def admin_required(view_func):
+    """Restricts a view to members of the ADMIN_GROUP_NAME group."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not is_admin(request.user):
+            raise PermissionDenied
+        return view_func(request, *args, **kwargs)
+    return wrapper
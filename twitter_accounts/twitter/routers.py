@@ -0,0 +1,63 @@
+"""Read replica routing.
+
+`ReplicaRouter` sends reads of the models listed in REPLICA_ROUTED_MODELS
+to one of the REPLICA_DATABASES, and everything else to the primary
+(`default`). Replicas lag behind the primary, so a user must not be sent
+to one right after changing something: once a routed model is written,
+the rest of the request reads from the primary, and
+`PrimaryPinningMiddleware` keeps the user's following requests (e.g. the
+redirect after following someone or posting a tweet) on the primary for
+REPLICA_PIN_SECONDS, tracked in the session.
+
+Outside of requests (management commands, workers) a write pins the
+thread to the primary for good.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PIN_SESSION_KEY = '_db_pinned_until'
+
+_local = threading.local()
+
+
+def is_pinned():
+    return getattr(_local, 'pinned', False) or getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter(object):
+
+    def _routed(self, model):
+        return model._meta.label_lower in settings.REPLICA_ROUTED_MODELS
+
+    def db_for_read(self, model, **hints):
+        if not settings.REPLICA_DATABASES or not self._routed(model) \
+                or is_pinned():
+            return None
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        if self._routed(model):
+            _local.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+class PrimaryPinningMiddleware(object):
+    """Must come after SessionMiddleware."""
+
+    def process_request(self, request):
+        _local.wrote = False
+        _local.pinned = request.session.get(PIN_SESSION_KEY, 0) > time.time()
+
+    def process_response(self, request, response):
+        if getattr(_local, 'wrote', False) and hasattr(request, 'session'):
+            request.session[PIN_SESSION_KEY] = (
+                time.time() + settings.REPLICA_PIN_SECONDS)
+        _local.wrote = _local.pinned = False
+        return response
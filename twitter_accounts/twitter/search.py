@@ -0,0 +1,55 @@
+"""Full-text search over tweets.
+
+Tweets are split into terms by `tokenize` and every term is stored as a
+row of the `Posting` table (an inverted index), kept in sync when tweets
+are saved and deleted. A search reads the newest postings of each query
+term only (up to SEARCH_MAX_CANDIDATES), ranks tweets by how many of the
+terms they contain and breaks ties by recency, so it never scans
+`Tweet.content` nor every posting of a common term.
+
+Result pages are keyset paginated like the feeds; the cursor is prefixed
+with the rank of the last result: `<rank>_<micros>_<id>`.
+"""
+import re
+
+from .pagination import encode_cursor, decode_cursor
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+MAX_QUERY_TERMS = 10
+
+STOP_WORDS = frozenset("""
+    an and are as at be but by for from has have he her his if in into is it
+    its me my no not of on or our she so than that the their them then there
+    they this to was we were what when which who will with you your
+""".split())
+
+
+def tokenize(text):
+    """Returns the distinct search terms of `text`, in order of appearance."""
+    terms = []
+    for word in TERM_RE.findall((text or '').lower()):
+        word = word[:MAX_TERM_LENGTH]
+        if len(word) >= MIN_TERM_LENGTH and word not in STOP_WORDS \
+                and word not in terms:
+            terms.append(word)
+    return terms
+
+
+def encode_search_cursor(rank, created, pk):
+    return '{}_{}'.format(rank, encode_cursor(created, pk))
+
+
+def decode_search_cursor(cursor):
+    """Returns a `(rank, created, pk)` tuple, or None if `cursor` is empty
+    or malformed."""
+    try:
+        rank, position = cursor.split('_', 1)
+        rank = int(rank)
+    except (AttributeError, ValueError):
+        return None
+    position = decode_cursor(position)
+    if position is None:
+        return None
+    return (rank,) + position
@@ -0,0 +1,34 @@
+"""Cached database sessions with write-behind of short-lived keys.
+
+Sessions are read from the cache and only fall back to the database on a
+miss, like Django's `cached_db` engine. Keys listed in
+SESSION_CACHE_ONLY_KEYS (such as the replica pin, which is only good for a
+few seconds) are written to the cache alone: a save that changes nothing
+else skips the `django_session` UPDATE, and the database copy catches up
+with them on the next save that does. Losing one of those keys to a cache
+eviction has to be harmless.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+
+
+class SessionStore(cached_db.SessionStore):
+
+    def _persistent(self, data):
+        return dict((key, value) for key, value in data.items()
+                    if key not in settings.SESSION_CACHE_ONLY_KEYS)
+
+    def load(self):
+        data = super(SessionStore, self).load()
+        self._stored = self._persistent(data)
+        return data
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or \
+                self._persistent(self._session) != getattr(
+                    self, '_stored', None):
+            super(SessionStore, self).save(must_create)
+            self._stored = self._persistent(self._session)
+        else:
+            self._cache.set(self.cache_key, self._session,
+                            self.get_expiry_age())
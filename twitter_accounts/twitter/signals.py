@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete)
+from django.dispatch import receiver
+
+from . import pagecache, roles
+from .models import ArchivedTweet, DailyStats, Tweet
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse,
+                                          pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            roles.invalidate(instance.pk)
+            # keep a later full save of this instance from writing the
+            # old version back
+            instance.refresh_from_db(fields=['roles_version'])
+    elif action == 'pre_clear':
+        # pk_set is None on clear; remember the members before they're gone
+        instance._role_user_pks = list(
+            instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        roles.invalidate(*getattr(instance, '_role_user_pks', []))
+    elif action in ('post_add', 'post_remove'):
+        roles.invalidate(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, instance, **kwargs):
+    roles.invalidate(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=User)
+def record_signup(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        DailyStats.objects.record_signup(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_profile_page(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pagecache.bump_version(instance.username)
+
+
+@receiver(post_save, sender=Tweet)
+@receiver(post_delete, sender=Tweet)
+@receiver(post_delete, sender=ArchivedTweet)
+def invalidate_author_profile_page(sender, instance, raw=False, **kwargs):
+    if not instance.user_id or raw:
+        return
+    try:
+        username = instance.user.username
+    except User.DoesNotExist:
+        # Deleted along with its author, whose page is gone too.
+        return
+    pagecache.bump_version(username)
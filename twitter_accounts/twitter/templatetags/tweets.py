@@ -0,0 +1,46 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ..avatars import best_size, thumbnail_name
+from ..entities import linkify
+
+register = template.Library()
+
+
+@register.simple_tag
+def tweet_card(tweet):
+    """Renders the viewer-independent part of a tweet (author, date and
+    content), served from the cache when possible."""
+    key = tweet.card_cache_key
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('tweet_card.html', {'tweet': tweet})
+        cache.set(key, html, settings.TWEET_CARD_CACHE_TIMEOUT)
+    return mark_safe(html)
+
+
+register.filter('linkify', linkify, is_safe=True)
+
+
+@register.inclusion_tag('avatar.html')
+def avatar(user, size=128):
+    """Renders `user`'s avatar using the closest pre-generated thumbnail,
+    with a WebP source for browsers that support it. Falls back to the
+    original upload while thumbnails are still being generated."""
+    context = {'size': size, 'webp_url': None, 'url': None}
+    if not user.avatar:
+        return context
+    thumbnail_size = best_size(size)
+    jpeg = thumbnail_name(user.avatar.name, thumbnail_size)
+    if not default_storage.exists(jpeg):
+        context['url'] = user.avatar.url
+        return context
+    context['url'] = default_storage.url(jpeg)
+    webp = thumbnail_name(user.avatar.name, thumbnail_size, 'webp')
+    if default_storage.exists(webp):
+        context['webp_url'] = default_storage.url(webp)
+    return context
@@ -1,16 +1,43 @@
+import mimetypes
+import os
+import re
+import stat
+import time
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponseForbidden
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden,
+    HttpResponseNotModified, JsonResponse)
 from django.core.exceptions import PermissionDenied
-from django.contrib.auth import logout as django_logout, get_user_model
+from django.contrib.auth import (
+    logout as django_logout, get_user_model, update_session_auth_hash)
 
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
-from django.db.models import Q
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.template.loader import render_to_string
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
 from django.views.decorators.http import require_POST
 
-from .models import Tweet
-from .forms import TweetForm, ProfileForm
+from .models import (
+    Tweet, ArchivedTweet, ValidationToken, OutgoingEmail, DailyStats,
+    HourlyTweetCount, Posting, Hashtag, HashtagCount)
+from .forms import (
+    TweetForm, ProfileForm, RegisterForm, ChangePasswordForm,
+    ResetPasswordForm, NewPasswordForm)
+from . import profiling
+from .avatars import schedule_thumbnails
+from .live import get_broker
+from .pagecache import cached_page
+from .pagination import encode_cursor
+from .ratelimit import ratelimit
+from .roles import admin_required
 
 User = get_user_model()
 
@@ -21,11 +48,18 @@ def logout(request):
     return redirect('/')
 
 
+@ratelimit('tweet')
 def home(request, username=None):
     if not request.user.is_authenticated():
         if not username or request.method != 'GET':
             return redirect(settings.LOGIN_URL + '?next=%s' % request.path)
+        if not len(messages.get_messages(request)):
+            return cached_page(request, username,
+                               lambda: _feed(request, username))
+    return _feed(request, username)
+
 
+def _feed(request, username=None):
     user = request.user
 
     if request.method == 'POST':
@@ -39,15 +73,18 @@ def home(request, username=None):
             messages.success(request, 'Tweet Created!')
 
     form = TweetForm()
+    cursor = request.GET.get('cursor')
+    live_cursor = None
 
     if username:
         user = get_object_or_404(get_user_model(), username=username)
         form = None
-        tweets = Tweet.objects.filter(user=user)
+        tweets, next_cursor = user.tweets_page(cursor)
     else:
-        users_following = request.user.following
-        tweets = Tweet.objects.filter(
-            Q(user=user) | Q(user__in=users_following))
+        tweets, next_cursor = request.user.timeline(cursor)
+        if not cursor:
+            live_cursor = (encode_cursor(tweets[0].created, tweets[0].pk)
+                           if tweets else '')
 
     following_profile = (request.user.is_authenticated() and
                          request.user.is_following(user))
@@ -55,7 +92,65 @@ def home(request, username=None):
         'form': form,
         'twitter_profile': user,
         'tweets': tweets,
-        'following_profile': following_profile
+        'next_cursor': next_cursor,
+        'following_profile': following_profile,
+        'who_to_follow': None if username else user.who_to_follow(),
+        'live_updates': live_cursor is not None,
+        'live_cursor': live_cursor,
+    })
+
+
+@profiling.not_sampled
+@login_required()
+@require_safe
+def updates(request):
+    """Long-polls for tweets added to the home feed after `cursor`. Tweets
+    that are already there are returned without waiting."""
+    poll_after = 0
+    with get_broker().listen(request.user.pk) as event:
+        tweets, cursor = request.user.timeline_since(
+            request.GET.get('cursor'))
+        if not tweets:
+            if event is None:
+                poll_after = settings.LIVE_UPDATES_BUSY_DELAY
+            elif event.wait(settings.LIVE_UPDATES_TIMEOUT):
+                tweets, cursor = request.user.timeline_since(cursor)
+    return JsonResponse({
+        'count': len(tweets),
+        'cursor': cursor,
+        'poll_after': poll_after,
+        'html': render_to_string('new_tweets.html', {'tweets': tweets}),
+    })
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    tweets, next_cursor = Posting.objects.search(
+        query, request.GET.get('cursor'))
+    return render(request, 'search.html', {
+        'query': query,
+        'tweets': tweets,
+        'next_cursor': next_cursor,
+    })
+
+
+def tag(request, name):
+    tweets, next_cursor = Hashtag.objects.feed(name, request.GET.get('cursor'))
+    return render(request, 'tweet_list.html', {
+        'title': '#' + name.lower(),
+        'tweets': tweets,
+        'next_cursor': next_cursor,
+        'trending': HashtagCount.objects.trending(),
+    })
+
+
+@login_required()
+def mentions(request):
+    tweets, next_cursor = request.user.mentions_page(request.GET.get('cursor'))
+    return render(request, 'tweet_list.html', {
+        'title': 'Mentions',
+        'tweets': tweets,
+        'next_cursor': next_cursor,
     })
 
 
@@ -69,7 +164,12 @@ def profile(request):
             user.first_name = form.cleaned_data["first_name"]
             user.last_name = form.cleaned_data["last_name"]
             user.birth_date = form.cleaned_data["birth_date"]
-            user.save()
+            # Only the edited fields: a full save would write back stale
+            # follow counters over concurrent F() updates.
+            user.save(update_fields=[
+                'avatar', 'first_name', 'last_name', 'birth_date', 'updated'])
+            if form.cleaned_data["avatar"]:
+                schedule_thumbnails(user.avatar.name)
             messages.success(request, 'Profile updated successfully!')
     else:
         form = ProfileForm(initial={
@@ -87,15 +187,20 @@ def profile(request):
 
 @login_required()
 @require_POST
+@ratelimit('follow')
 def follow(request):
     followed = get_object_or_404(
         get_user_model(), username=request.POST['username'])
-    request.user.follow(followed)
+    if followed == request.user:
+        messages.error(request, 'You cannot follow yourself.')
+    else:
+        request.user.follow(followed)
     return redirect(request.GET.get('next', '/'))
 
 
 @login_required()
 @require_POST
+@ratelimit('follow')
 def unfollow(request):
     unfollowed = get_object_or_404(
         get_user_model(), username=request.POST['username'])
@@ -105,9 +210,220 @@ def unfollow(request):
 
 @login_required()
 def delete_tweet(request, tweet_id):
-    tweet = get_object_or_404(Tweet, pk=tweet_id)
+    tweet = (Tweet.objects.filter(pk=tweet_id).first() or
+             get_object_or_404(ArchivedTweet, pk=tweet_id))
     if tweet.user != request.user:
         raise PermissionDenied
+    cache.delete(tweet.card_cache_key)
     tweet.delete()
     messages.success(request, 'Tweet successfully deleted')
     return redirect(request.GET.get('next', '/'))
+
+
+def register(request):
+    if request.method == 'POST':
+        form = RegisterForm(request.POST, request.FILES)
+        if form.is_valid():
+            user = form.save()
+            token = ValidationToken.objects.issue(
+                user.email, ValidationToken.VALIDATE_EMAIL, user)
+            OutgoingEmail.objects.enqueue(
+                'Validate your account',
+                'Thanks for registering. To complete the process, please '
+                'click in the link below: {}/users/validate/{}'.format(
+                    settings.SITE_URL, token.token),
+                [user.email])
+            messages.success(
+                request, 'Check your email to complete the registration.')
+            return redirect(settings.LOGIN_URL)
+    else:
+        form = RegisterForm()
+
+    return render(request, 'register.html', {
+        'form': form
+    })
+
+
+def validate_user(request, token):
+    token = get_object_or_404(
+        ValidationToken.objects.valid(ValidationToken.VALIDATE_EMAIL),
+        token=token)
+    user = token.get_user()
+    if user is None:
+        raise Http404('No user has this address anymore.')
+    get_user_model().objects.filter(pk=user.pk).update(
+        is_active=True, email_validated=True)
+    token.delete()
+    messages.success(request, 'Your account is now active. Please log in.')
+    return redirect(settings.LOGIN_URL)
+
+
+@login_required()
+def change_password(request):
+    if request.method == 'POST':
+        form = ChangePasswordForm(request.user, request.POST)
+        if form.is_valid():
+            user = form.save()
+            update_session_auth_hash(request, user)
+            messages.success(request, 'Password changed successfully!')
+            return redirect('/profile')
+    else:
+        form = ChangePasswordForm(request.user)
+
+    return render(request, 'change_password.html', {
+        'form': form
+    })
+
+
+def reset_password(request):
+    if request.method == 'POST':
+        form = ResetPasswordForm(request.POST)
+        if form.is_valid():
+            email = form.cleaned_data['email']
+            # email is not unique: every account of the address gets a
+            # link of its own
+            for user in get_user_model().objects.filter(email=email):
+                token = ValidationToken.objects.issue(
+                    email, ValidationToken.RESET_PASSWORD, user)
+                OutgoingEmail.objects.enqueue(
+                    'Reset your password',
+                    'To reset your password, please click in the link '
+                    'below: {}/users/confirm-reset-password/{}'.format(
+                        settings.SITE_URL, token.token),
+                    [email])
+            # same answer whether or not the address is registered
+            messages.success(
+                request, 'Check your email to reset your password.')
+            return redirect(settings.LOGIN_URL)
+    else:
+        form = ResetPasswordForm()
+
+    return render(request, 'reset_password.html', {
+        'form': form
+    })
+
+
+def confirm_reset_password(request, token):
+    token = get_object_or_404(
+        ValidationToken.objects.valid(ValidationToken.RESET_PASSWORD),
+        token=token)
+    user = token.get_user()
+    if user is None:
+        raise Http404('No user has this address anymore.')
+    if request.method == 'POST':
+        form = NewPasswordForm(user, request.POST)
+        if form.is_valid():
+            form.save()
+            token.delete()
+            messages.success(request, 'Password reset successfully!')
+            return redirect(settings.LOGIN_URL)
+    else:
+        form = NewPasswordForm(user)
+
+    return render(request, 'confirm_reset_password.html', {
+        'form': form
+    })
+
+
+@login_required()
+@admin_required
+def dashboard(request):
+    return render(request, 'dashboard.html', {
+        'daily_stats': DailyStats.objects.all()[:settings.DASHBOARD_DAYS],
+        'hourly_tweets': HourlyTweetCount.objects.all()[:24],
+        'top_accounts': get_user_model().objects.order_by(
+            '-followers_count', 'pk')[:settings.DASHBOARD_TOP_ACCOUNTS],
+    })
+
+
+@profiling.not_sampled
+@login_required()
+@admin_required
+def sampling_profile(request):
+    """A POST starts sampling the requests served by this process for
+    `seconds` in the background; a GET downloads the stacks sampled so far
+    in collapsed (flamegraph) format."""
+    if request.method == 'POST':
+        try:
+            seconds = float(request.POST.get(
+                'seconds', settings.PROFILING_WINDOW))
+        except ValueError:
+            seconds = settings.PROFILING_WINDOW
+        seconds = max(0, min(seconds, settings.PROFILING_MAX_WINDOW))
+        profiling.start_sampling(seconds)
+        messages.success(
+            request, 'Sampling requests for {:g} seconds.'.format(seconds))
+        return redirect('/dashboard')
+
+    sampler = profiling.current_sampler()
+    if sampler is None:
+        raise Http404('No requests were sampled yet.')
+    return profiling.download(
+        sampler.collapsed(), 'text/plain',
+        'requests-{}.collapsed'.format(int(time.time())))
+
+
+# Avatars and their thumbnails are named after the SHA-1 of their content
+# (see `fields.ContentHashedImageField`), so they never change once written.
+CONTENT_HASHED_NAME = re.compile(r'(?:^|/)([0-9a-f]{40})(?:_\d+)?\.\w+$')
+
+
+@require_safe
+def media(request, path):
+    """Serves uploaded files. Conditional requests are answered from a
+    stat() of the file without opening it, and the body is either streamed
+    in blocks or handed off to the front proxy (MEDIA_SENDFILE_HEADER)."""
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('"{}" does not exist'.format(path))
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404('"{}" does not exist'.format(path))
+
+    hashed = CONTENT_HASHED_NAME.search(path)
+    if hashed:
+        etag = quote_etag(os.path.basename(path))
+        max_age = settings.MEDIA_HASHED_CACHE_MAX_AGE
+    else:
+        etag = quote_etag('{:x}-{:x}'.format(
+            int(stat_result.st_mtime), stat_result.st_size))
+        max_age = settings.MEDIA_CACHE_MAX_AGE
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        not_modified = etag in [
+            tag.strip() for tag in if_none_match.split(',')] or \
+            if_none_match.strip() == '*'
+    else:
+        not_modified = not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat_result.st_mtime, stat_result.st_size)
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    if not_modified:
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_SENDFILE_HEADER:
+        response = HttpResponse(
+            content_type=content_type or 'application/octet-stream')
+        if settings.MEDIA_SENDFILE_HEADER == 'X-Accel-Redirect':
+            response['X-Accel-Redirect'] = (
+                settings.MEDIA_ACCEL_REDIRECT_PREFIX + path)
+        else:
+            response[settings.MEDIA_SENDFILE_HEADER] = fullpath
+    else:
+        response = FileResponse(
+            open(fullpath, 'rb'),
+            content_type=content_type or 'application/octet-stream')
+        response['Content-Length'] = stat_result.st_size
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat_result.st_mtime)
+    if hashed:
+        patch_cache_control(response, public=True, max_age=max_age,
+                            immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
@@ -41,14 +41,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    'twitter.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'twitter.routers.PrimaryPinningMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
+    'twitter.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'twitter.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'twitter_accounts.urls'
@@ -64,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'twitter.context_processors.user_roles',
             ],
         },
     },
@@ -83,6 +88,23 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/1.9/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'twitter',
+    },
+    # Rate limit buckets (see RATELIMIT_CACHE); use a shared cache such as
+    # memcached when running more than one process.
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'twitter-ratelimit',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
 
@@ -137,3 +159,182 @@ MEDIA_URL = '/media/'
 AUTH_USER_MODEL = 'twitter.User'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Home timelines are precomputed (fan-out on write). A timeline keeps at
+# most TIMELINE_LENGTH tweets per followed account on backfill, and rows
+# are inserted in batches of TIMELINE_FANOUT_BATCH_SIZE.
+TIMELINE_LENGTH = 800
+TIMELINE_FANOUT_BATCH_SIZE = 500
+
+# Number of tweets per page in the home and profile feeds (keyset paginated).
+FEED_PAGE_SIZE = 20
+
+# Search ranks the newest SEARCH_MAX_CANDIDATES tweets of each query term;
+# older ones are not found.
+SEARCH_MAX_CANDIDATES = 1000
+
+# Seconds a rendered tweet card stays in the cache. Cards are keyed on the
+# tweet id and the author's last update, so this only bounds stale memory.
+TWEET_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Square avatar thumbnails (in px) generated for every uploaded avatar by a
+# pool of AVATAR_THUMBNAIL_WORKERS threads.
+AVATAR_THUMBNAIL_SIZES = (48, 128, 256)
+AVATAR_THUMBNAIL_WORKERS = 2
+AVATAR_THUMBNAILS_ASYNC = True
+
+# Cache lifetime (seconds) of files served from MEDIA_URL. Content-hashed
+# names (avatars and their thumbnails) never change, so they are cached for
+# a year. Set MEDIA_SENDFILE_HEADER to 'X-Accel-Redirect' (nginx) or
+# 'X-Sendfile' (Apache, lighttpd) to let the front proxy send the bytes.
+MEDIA_CACHE_MAX_AGE = 60 * 60
+MEDIA_HASHED_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Per-request instrumentation (see twitter.instrumentation). Counting
+# queries turns on the debug cursor of every connection during the
+# request; timing templates wraps Template.render for the whole process.
+INSTRUMENTATION_QUERIES = True
+INSTRUMENTATION_TEMPLATES = True
+
+# Maximum number of SQL queries per view (dotted path of the view), for a
+# GET by a user whose session already exists; logging in and POSTs run
+# more. Views over budget log a warning, or fail with QueryBudgetExceeded
+# when QUERY_BUDGET_STRICT is on. It is off by default, including in the
+# test suite, which silences the warnings: tests/test_instrumentation.py
+# turns it on to check the budgets.
+QUERY_BUDGETS = {
+    'twitter.views.home': 8,
+    'twitter.views.profile': 4,
+}
+QUERY_BUDGET_STRICT = False
+
+# Members of this group can see the admin dashboard. Group membership is
+# cached per user for ROLES_CACHE_TIMEOUT seconds; changes take effect on
+# the next request in every process (see twitter.roles).
+ADMIN_GROUP_NAME = 'Admin users'
+ROLES_CACHE_TIMEOUT = 60 * 60
+
+# Account validation and password reset tokens expire after
+# VALIDATION_TOKEN_TTL seconds; only the newest VALIDATION_TOKENS_PER_EMAIL
+# tokens of each address are kept. Links in emails point to SITE_URL.
+VALIDATION_TOKEN_TTL = 60 * 60 * 24 * 2
+VALIDATION_TOKENS_PER_EMAIL = 3
+SITE_URL = 'http://twitter.com'
+DEFAULT_FROM_EMAIL = 'no-reply@twitter.com'
+
+# Outgoing email is queued and sent by the `send_queued_mail` worker.
+# Failed sends are retried after EMAIL_QUEUE_RETRY_DELAY seconds, doubling
+# on every attempt, and given up after EMAIL_QUEUE_MAX_ATTEMPTS. Emails
+# claimed by a worker that has not finished them after
+# EMAIL_QUEUE_CLAIM_TIMEOUT seconds are picked up again by another.
+EMAIL_QUEUE_BATCH_SIZE = 100
+EMAIL_QUEUE_MAX_ATTEMPTS = 5
+EMAIL_QUEUE_RETRY_DELAY = 60
+EMAIL_QUEUE_CLAIM_TIMEOUT = 10 * 60
+
+# What the admin dashboard shows. All of it is read from rollup tables kept
+# up to date as things happen (see the `rebuild_stats` command).
+DASHBOARD_DAYS = 14
+DASHBOARD_TOP_ACCOUNTS = 10
+
+# Trending hashtags are summed from hourly counters over the last
+# TRENDING_TAGS_HOURS hours (keep it under the `rebuild_stats` window,
+# which purges older counters).
+TRENDING_TAGS_HOURS = 24
+TRENDING_TAGS_LIMIT = 10
+
+# "Who to follow" suggestions kept per user by `compute_suggestions`, and
+# how many of them the home feed shows.
+SUGGESTIONS_PER_USER = 20
+SUGGESTIONS_SHOWN = 5
+
+# Live home feed updates (see twitter.live). A poll waits up to
+# LIVE_UPDATES_TIMEOUT seconds for new tweets and returns at most
+# LIVE_UPDATES_LIMIT of them. Each waiting poll holds a worker thread, so
+# at most LIVE_UPDATES_MAX_WAITERS of them wait per process (keep it below
+# the thread count); the others are told to poll again after
+# LIVE_UPDATES_BUSY_DELAY seconds.
+LIVE_UPDATES_BROKER = 'twitter.live.LocalBroker'
+LIVE_UPDATES_TIMEOUT = 25
+LIVE_UPDATES_LIMIT = 50
+LIVE_UPDATES_MAX_WAITERS = 8
+LIVE_UPDATES_BUSY_DELAY = 30
+
+# Largest page the JSON API returns (`?limit=`); the default is
+# FEED_PAGE_SIZE.
+API_MAX_PAGE_SIZE = 1000
+
+# Read replicas (see twitter.routers). Reads of REPLICA_ROUTED_MODELS go to
+# one of REPLICA_DATABASES, unless the user wrote something in the last
+# REPLICA_PIN_SECONDS seconds. To try it locally, point
+# TWITTER_REPLICA_DATABASE at a copy of db.sqlite3 (copy it again to
+# "replicate"). Leave it unset when running the tests: SQLite's in-memory
+# test database cannot be mirrored.
+DATABASE_ROUTERS = ['twitter.routers.ReplicaRouter']
+REPLICA_ROUTED_MODELS = (
+    'twitter.tweet', 'twitter.user', 'twitter.relationship')
+REPLICA_DATABASES = []
+REPLICA_PIN_SECONDS = 5
+if os.environ.get('TWITTER_REPLICA_DATABASE'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['TWITTER_REPLICA_DATABASE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES = ['replica']
+
+# Cached profile pages of anonymous visitors (see twitter.pagecache). Pages
+# are kept PROFILE_PAGE_CACHE_TIMEOUT seconds and browsers and proxies may
+# reuse them for PROFILE_PAGE_MAX_AGE. While one request rebuilds a page,
+# others wait up to PROFILE_PAGE_WAIT seconds for it.
+PROFILE_PAGE_CACHE_TIMEOUT = 300
+PROFILE_PAGE_MAX_AGE = 30
+PROFILE_PAGE_LOCK_TIMEOUT = 10
+PROFILE_PAGE_WAIT = 2
+
+# Rate limits (see twitter.ratelimit): scope -> ('user' or 'ip', rate).
+# RATELIMITED_VIEWS limits views of other apps: dotted path -> scope.
+RATELIMITS = {
+    'tweet': ('user', '30/m'),
+    'follow': ('user', '60/m'),
+    'login': ('ip', '10/m'),
+}
+RATELIMITED_VIEWS = {
+    'django.contrib.auth.views.login': 'login',
+}
+# Buckets are kept in this cache alias, which must be shared by every
+# process. Client IPs are read from RATELIMIT_IP_META_KEY, or from
+# X-Forwarded-For when RATELIMIT_PROXY_COUNT proxies sit in front.
+RATELIMIT_CACHE = 'ratelimit'
+RATELIMIT_IP_META_KEY = 'REMOTE_ADDR'
+RATELIMIT_PROXY_COUNT = 0
+
+# Sessions are read from the cache (see twitter.sessions), so it must be
+# shared by every process in production, e.g. memcached; `check --deploy`
+# warns when it is not. Set TWITTER_SESSION_ENGINE=signed_cookies to keep
+# them in a signed cookie instead, with no server-side storage at all.
+# Session keys that only need to live in the cache are listed in
+# SESSION_CACHE_ONLY_KEYS. Messages go in a cookie, so showing one never
+# writes the session.
+SESSION_ENGINES = {
+    'cached_db': 'twitter.sessions',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[
+    os.environ.get('TWITTER_SESSION_ENGINE', 'cached_db')]
+SESSION_CACHE_ONLY_KEYS = ('_db_pinned_until',)
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Profiling for admin users (see twitter.profiling). Stacks are sampled
+# every PROFILING_INTERVAL seconds; /profiling samples in the background
+# for PROFILING_WINDOW seconds unless told otherwise, and never more than
+# PROFILING_MAX_WINDOW.
+PROFILING_INTERVAL = 0.005
+PROFILING_WINDOW = 10
+PROFILING_MAX_WINDOW = 60
+
+# Tweets older than TWEET_ARCHIVE_DAYS days are moved to the archive table
+# by the archive_tweets command; profile pages still show them.
+TWEET_ARCHIVE_DAYS = 365